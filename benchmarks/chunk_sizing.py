@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Chunk size benchmark.
+Downloads generated files from a local HTTP server through the same
+rechunk + disk writer path the bot uses, then uploads them back through
+the multipart body, once per chunk size setting. Prints throughput and
+peak RSS growth for every file size and setting.
+
+    python benchmarks/chunk_sizing.py --sizes 16,256,1024 --bandwidth 0
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+from aiohttp import web
+from helpers.chunking import chunk_sizer, rechunk
+from helpers.file_io import AsyncFileWriter, remove_file
+from helpers.multipart import MultipartFilePayload
+
+MB = 1024 * 1024
+BLOCK = os.urandom(MB)
+DEFAULT_BOUNDS = (chunk_sizer.minimum, chunk_sizer.maximum)
+
+def read_rss() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+class RssSampler:
+    """Peak RSS above the starting point while the block runs"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+
+    async def _run(self):
+        while True:
+            self.peak = max(self.peak, read_rss() - self.base)
+            await asyncio.sleep(self.interval)
+
+    async def __aenter__(self):
+        self.base = read_rss()
+        self.task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc):
+        self.task.cancel()
+        self.peak = max(self.peak, read_rss() - self.base)
+
+def make_app(bandwidth: int):
+    async def download(request):
+        size = int(request.match_info["size"])
+        response = web.StreamResponse(headers={"Content-Length": str(size)})
+        await response.prepare(request)
+        sent = 0
+        started = time.perf_counter()
+        while sent < size:
+            piece = BLOCK[:min(len(BLOCK), size - sent)]
+            await response.write(piece)
+            sent += len(piece)
+            if bandwidth:
+                ahead = sent / bandwidth - (time.perf_counter() - started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+        await response.write_eof()
+        return response
+
+    async def upload(request):
+        received = 0
+        async for data in request.content.iter_any():
+            received += len(data)
+        return web.json_response({"status": "ok", "received": received})
+
+    app = web.Application()
+    app.router.add_get("/file/{size}", download)
+    app.router.add_post("/uploadfile", upload)
+    return app
+
+def configure(fixed: int = None):
+    """Pin the shared chunk size, or restore adaptive sizing"""
+    if fixed:
+        chunk_sizer.minimum = chunk_sizer.maximum = chunk_sizer.size = fixed
+    else:
+        chunk_sizer.minimum, chunk_sizer.maximum = DEFAULT_BOUNDS
+        chunk_sizer.size = chunk_sizer._clamp(4 * MB)
+    chunk_sizer.throughput = 0.0
+
+async def run_once(session, base_url: str, size: int, path: str) -> dict:
+    async with RssSampler() as rss:
+        started = time.perf_counter()
+        async with session.get(f"{base_url}/file/{size}") as response:
+            async with await AsyncFileWriter.open(path) as f:
+                async for chunk in rechunk(response.content.iter_any()):
+                    await f.write(chunk)
+        download_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        body = MultipartFilePayload(path, {"token": "bench"})
+        async with session.post(f"{base_url}/uploadfile", data=body) as response:
+            await response.read()
+        upload_seconds = time.perf_counter() - started
+
+    await remove_file(path)
+    return {
+        "download_mbps": size / MB / download_seconds,
+        "upload_mbps": size / MB / upload_seconds,
+        "peak_rss_mb": rss.peak / MB,
+        "final_chunk_kb": chunk_sizer.size // 1024
+    }
+
+async def main(args):
+    runner = web.AppRunner(make_app(args.bandwidth * MB))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    settings = [("adaptive", None)] + [(f"fixed {kb} KB", kb * 1024) for kb in args.fixed]
+    path = os.path.join(tempfile.gettempdir(), "gfbot_chunk_bench.bin")
+
+    print(f"{'size MB':>8} {'setting':>16} {'down MB/s':>10} {'up MB/s':>10} {'peak RSS MB':>12} {'chunk KB':>9}")
+    async with aiohttp.ClientSession() as session:
+        for size_mb in args.sizes:
+            for name, fixed in settings:
+                configure(fixed)
+                result = await run_once(session, base_url, size_mb * MB, path)
+                print(
+                    f"{size_mb:>8} {name:>16} {result['download_mbps']:>10.1f} {result['upload_mbps']:>10.1f} "
+                    f"{result['peak_rss_mb']:>12.1f} {result['final_chunk_kb']:>9}"
+                )
+
+    await runner.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare fixed and adaptive chunk sizes")
+    parser.add_argument("--sizes", type=lambda v: [int(x) for x in v.split(",")], default=[16, 128, 512],
+                        help="File sizes in MB")
+    parser.add_argument("--fixed", type=lambda v: [int(x) for x in v.split(",")], default=[256, 1024, 4096, 16384],
+                        help="Fixed chunk sizes in KB to compare against")
+    parser.add_argument("--bandwidth", type=int, default=0, help="Server bandwidth cap in MB/s, 0 for none")
+    parser.add_argument("--port", type=int, default=8767)
+    asyncio.run(main(parser.parse_args()))
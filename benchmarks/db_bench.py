@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Database scaling benchmark.
+Generates synthetic database.json files with increasing user counts and
+measures, for each size:
+
+  - Database.load() time and RSS growth
+  - every mutation type, each of which rewrites the whole file
+  - a bare save and get_bot_stats
+  - encode/decode time and size for every available serializer
+  - the same user operations on a SQLite table, for comparison
+
+A backend counts as viable at a size while its slowest mutation stays
+within --budget milliseconds. Results are written as JSON.
+
+    python benchmarks/db_bench.py --sizes 10000,100000,1000000 --output db.json
+"""
+import gc
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import asyncio
+import argparse
+import platform
+import tempfile
+import statistics
+import importlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunk_sizing import read_rss
+
+MB = 1024 * 1024
+USER_ID_BASE = 6_000_000_000
+NEW_USER_BASE = 7_000_000_000
+
+def make_data(users: int, seed: int = 1) -> dict:
+    """A database.json document with `users` plausible users"""
+    rng = random.Random(seed)
+    data = {
+        "users": {},
+        "fsub_channels": [
+            {"id": -1001000000000 - i, "name": f"Channel {i}", "link": "", "added_date": "2026-01-01T00:00:00"}
+            for i in range(2)
+        ],
+        "banned_users": [USER_ID_BASE + i for i in range(0, users, 100)],
+        "ads": {"enabled": False, "message": "", "button_text": "", "button_url": ""},
+        "bot_stats": {"total_uploads": 0, "total_size_uploaded": 0, "start_time": "2026-01-01T00:00:00"},
+        "settings": {"fsub_enabled": True, "maintenance_mode": False, "welcome_message": ""}
+    }
+    for index in range(users):
+        user_id = USER_ID_BASE + index
+        uploads = rng.randrange(50)
+        data["users"][str(user_id)] = {
+            "user_id": user_id,
+            "first_name": f"User {index}",
+            "username": f"user_{index}" if rng.random() < 0.7 else "",
+            "joined_date": f"2026-0{rng.randrange(1, 10)}-1{rng.randrange(10)}T12:00:00.{rng.randrange(10 ** 6):06d}",
+            "last_active": f"2026-0{rng.randrange(1, 10)}-2{rng.randrange(10)}T12:00:00.{rng.randrange(10 ** 6):06d}",
+            "uploads_count": uploads,
+            "total_size": uploads * rng.randrange(1, 2 * 1024 ** 3)
+        }
+        data["bot_stats"]["total_uploads"] += uploads
+    return data
+
+def available_codecs() -> dict:
+    """name -> (encode, decode) for every serializer installed here"""
+    codecs = {
+        "json-indent": (lambda d: json.dumps(d, indent=2, default=str).encode(), json.loads),
+        "json-compact": (lambda d: json.dumps(d, separators=(",", ":"), default=str).encode(), json.loads)
+    }
+    try:
+        import orjson
+        codecs["orjson"] = (lambda d: orjson.dumps(d, default=str), orjson.loads)
+    except ImportError:
+        pass
+    try:
+        import msgpack
+        codecs["msgpack"] = (
+            lambda d: msgpack.packb(d, default=str),
+            lambda b: msgpack.unpackb(b, strict_map_key=False)
+        )
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        for name, (encode, decode) in list(codecs.items()):
+            if name == "json-indent":
+                continue
+            codecs[f"{name}+zstd"] = (
+                lambda d, encode=encode: zstandard.ZstdCompressor(level=3).compress(encode(d)),
+                lambda b, decode=decode: decode(zstandard.ZstdDecompressor().decompress(b))
+            )
+    except ImportError:
+        pass
+    return codecs
+
+def timed(func, *args) -> float:
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+async def timed_async(coro) -> float:
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+# ================== JSON FILE (database.Database) ==================
+
+async def bench_database(database_module, size: int, repeats: int) -> dict:
+    gc.collect()
+    rss_before = read_rss()
+    db = database_module.Database()
+    load_seconds = await timed_async(db.load())
+    rss_growth = read_rss() - rss_before
+    assert len(db.data["users"]) == size
+
+    existing = lambda i: USER_ID_BASE + (i * 7919) % size
+    info = lambda i: {"first_name": f"Bench {i}", "username": f"bench_{i}"}
+    mutations = {
+        "add_user_new": lambda i: db.add_user(NEW_USER_BASE + i, info(i)),
+        "add_user_existing": lambda i: db.add_user(existing(i), info(i)),
+        "update_user_stats": lambda i: db.update_user_stats(existing(i), 1024 * 1024),
+        "ban_user": lambda i: db.ban_user(NEW_USER_BASE + i),
+        "unban_user": lambda i: db.unban_user(NEW_USER_BASE + i),
+        "toggle_fsub": lambda i: db.toggle_fsub(i % 2 == 0),
+        "set_ads": lambda i: db.set_ads(True, f"Ad {i}", "Open", "https://example.com"),
+        "save": lambda i: db._save_db()
+    }
+
+    mutation_ms = {}
+    for name, make in mutations.items():
+        runs = [await timed_async(make(i)) for i in range(repeats)]
+        mutation_ms[name] = round(statistics.median(runs) * 1000, 2)
+
+    calls = 1000
+    started = time.perf_counter()
+    for _ in range(calls):
+        await db.get_bot_stats()
+    stats_us = (time.perf_counter() - started) / calls * 1e6
+
+    return {
+        "load_seconds": round(load_seconds, 3),
+        "load_rss_mb": round(rss_growth / MB, 1),
+        "mutation_ms": mutation_ms,
+        "get_bot_stats_us": round(stats_us, 2),
+        "worst_mutation_ms": max(mutation_ms.values())
+    }
+
+# ================== SQLITE (comparison) ==================
+
+class SQLiteUsers:
+    """The users table of the database in SQLite, one row write per mutation"""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                first_name TEXT, username TEXT,
+                joined_date TEXT, last_active TEXT,
+                uploads_count INTEGER, total_size INTEGER
+            )
+        """)
+
+    def import_users(self, users: dict):
+        self.conn.execute("BEGIN")
+        self.conn.executemany(
+            "INSERT INTO users VALUES (:user_id, :first_name, :username, :joined_date, :last_active, :uploads_count, :total_size)",
+            users.values()
+        )
+        self.conn.execute("COMMIT")
+
+    def add_user(self, user_id: int, info: dict):
+        now = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.conn.execute(
+            "INSERT INTO users VALUES (?, ?, ?, ?, ?, 0, 0) ON CONFLICT(user_id) DO UPDATE SET "
+            "first_name = excluded.first_name, username = excluded.username, last_active = excluded.last_active",
+            (user_id, info["first_name"], info["username"], now, now)
+        )
+
+    def update_user_stats(self, user_id: int, file_size: int):
+        self.conn.execute(
+            "UPDATE users SET uploads_count = uploads_count + 1, total_size = total_size + ? WHERE user_id = ?",
+            (file_size, user_id)
+        )
+
+    def stats(self):
+        return self.conn.execute("SELECT COUNT(*), SUM(uploads_count), SUM(total_size) FROM users").fetchone()
+
+    def close(self):
+        self.conn.close()
+
+def bench_sqlite(data: dict, size: int, repeats: int, workdir: str) -> dict:
+    path = os.path.join(workdir, "users.db")
+    store = SQLiteUsers(path)
+    import_seconds = timed(store.import_users, data["users"])
+    store.close()
+
+    gc.collect()
+    rss_before = read_rss()
+    started = time.perf_counter()
+    store = SQLiteUsers(path)
+    store.stats()
+    open_seconds = time.perf_counter() - started
+    rss_growth = read_rss() - rss_before
+
+    existing = lambda i: USER_ID_BASE + (i * 7919) % size
+    info = lambda i: {"first_name": f"Bench {i}", "username": f"bench_{i}"}
+    mutations = {
+        "add_user_new": lambda i: store.add_user(NEW_USER_BASE + i, info(i)),
+        "add_user_existing": lambda i: store.add_user(existing(i), info(i)),
+        "update_user_stats": lambda i: store.update_user_stats(existing(i), 1024 * 1024)
+    }
+    mutation_ms = {
+        name: round(statistics.median(timed(make, i) for i in range(repeats)) * 1000, 3)
+        for name, make in mutations.items()
+    }
+    stats_us = statistics.median(timed(store.stats) for _ in range(20)) * 1e6
+
+    store.close()
+    file_size = os.path.getsize(path)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return {
+        "import_seconds": round(import_seconds, 3),
+        "load_seconds": round(open_seconds, 4),
+        "load_rss_mb": round(rss_growth / MB, 1),
+        "file_mb": round(file_size / MB, 1),
+        "mutation_ms": mutation_ms,
+        "get_bot_stats_us": round(stats_us, 2),
+        "worst_mutation_ms": max(mutation_ms.values())
+    }
+
+# ================== SERIALIZERS ==================
+
+def bench_codecs(data: dict, codecs: dict, repeats: int) -> dict:
+    results = {}
+    for name, (encode, decode) in codecs.items():
+        encode_runs, decode_runs = [], []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            blob = encode(data)
+            encode_runs.append(time.perf_counter() - started)
+            decode_runs.append(timed(decode, blob))
+        results[name] = {
+            "encode_ms": round(statistics.median(encode_runs) * 1000, 1),
+            "decode_ms": round(statistics.median(decode_runs) * 1000, 1),
+            "mb": round(len(blob) / MB, 2)
+        }
+        del blob
+    return results
+
+# ================== MAIN ==================
+
+async def main(args):
+    workdir = tempfile.mkdtemp(prefix="gfbot_db_")
+    cwd = os.getcwd()
+    codecs = available_codecs()
+    curve = []
+
+    try:
+        # Database() reads database.json from the working directory
+        os.chdir(workdir)
+        database_module = importlib.import_module("database")
+
+        print(f"{'users':>9} {'file MB':>8} {'load s':>7} {'RSS MB':>7} {'json mut ms':>12} {'sqlite mut ms':>14}", file=sys.stderr)
+        for size in args.sizes:
+            data = make_data(size, args.seed)
+            with open(database_module.DATABASE_FILE, "w") as f:
+                json.dump(data, f, indent=2, default=str)
+            file_mb = os.path.getsize(database_module.DATABASE_FILE) / MB
+
+            point = {
+                "users": size,
+                "file_mb": round(file_mb, 1),
+                "serializers": bench_codecs(data, codecs, args.repeats),
+                "backends": {
+                    "json_file": await bench_database(database_module, size, args.repeats),
+                    "sqlite": bench_sqlite(data, size, args.repeats, workdir)
+                }
+            }
+            for backend in point["backends"].values():
+                backend["viable"] = backend["worst_mutation_ms"] <= args.budget
+            curve.append(point)
+
+            json_file, sqlite = point["backends"]["json_file"], point["backends"]["sqlite"]
+            print(
+                f"{size:>9} {file_mb:>8.1f} {json_file['load_seconds']:>7.2f} {json_file['load_rss_mb']:>7.1f} "
+                f"{json_file['worst_mutation_ms']:>12.1f} {sqlite['worst_mutation_ms']:>14.3f}",
+                file=sys.stderr
+            )
+            del data
+            gc.collect()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "benchmark": "database",
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "budget_ms": args.budget,
+        "serializers": list(codecs),
+        "max_viable_users": {
+            backend: max((p["users"] for p in curve if p["backends"][backend]["viable"]), default=0)
+            for backend in ("json_file", "sqlite")
+        },
+        "curve": curve
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure how the database scales with its user count")
+    parser.add_argument("--sizes", type=lambda v: [int(x) for x in v.split(",")], default=[10000, 100000, 1000000],
+                        help="User counts to generate")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per mutation, the median is reported")
+    parser.add_argument("--budget", type=float, default=50, help="Slowest acceptable mutation in ms")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    asyncio.run(main(parser.parse_args()))
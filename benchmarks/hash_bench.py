@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Content hashing benchmark.
+Feeds random data through StreamHasher in download-sized chunks, once
+per algorithm installed here, and reports single-core throughput next
+to the link speed the hash has to keep up with. Results are JSON.
+
+    python benchmarks/hash_bench.py --size 1024 --chunk 1 --output hash.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.hashing import ALGORITHMS, StreamHasher, xxhash
+
+MB = 1024 * 1024
+
+def available_algorithms() -> list:
+    return [name for name in ALGORITHMS if name != "xxh3" or xxhash]
+
+def bench(algorithm: str, block: bytes, chunks: int, repeats: int) -> dict:
+    runs = []
+    for _ in range(repeats):
+        hasher = StreamHasher(algorithm)
+        started = time.perf_counter()
+        for _ in range(chunks):
+            hasher.update(block)
+        runs.append(time.perf_counter() - started)
+
+    seconds = statistics.median(runs)
+    size = len(block) * chunks
+    return {
+        "seconds": round(seconds, 3),
+        "mb_per_second": round(size / MB / seconds, 1)
+    }
+
+def main(args):
+    block = os.urandom(int(args.chunk * MB))
+    chunks = max(int(args.size / args.chunk), 1)
+    results = {}
+    for algorithm in available_algorithms():
+        result = bench(algorithm, block, chunks, args.repeats)
+        # Share of one core hashing takes at the given line rate
+        if args.line_rate:
+            result["core_share_at_line_rate"] = round(args.line_rate / result["mb_per_second"], 3)
+        results[algorithm] = result
+        print(f"{algorithm:>8} {result['mb_per_second']:>9.1f} MB/s", file=sys.stderr)
+
+    report = {
+        "benchmark": "hashing",
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "size_mb": chunks * len(block) / MB,
+        "chunk_mb": args.chunk,
+        "line_rate_mb_per_second": args.line_rate,
+        "algorithms": results,
+        "missing": [name for name in ALGORITHMS if name not in results]
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure content hashing throughput per algorithm")
+    parser.add_argument("--size", type=float, default=1024, help="MB hashed per run")
+    parser.add_argument("--chunk", type=float, default=1, help="Chunk size in MB, downloads arrive in 1 MB chunks")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per algorithm, the median is reported")
+    parser.add_argument("--line-rate", type=float, default=125, help="Link speed in MB/s to compare against (1 Gbit/s)")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    main(parser.parse_args())
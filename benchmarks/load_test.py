@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Handler load test.
+Builds real Pyrogram Message and CallbackQuery objects bound to a fake
+client and pushes a burst of them through the bot's handlers (start,
+url_handler, file_handler, check_fsub_callback) with as many dispatch
+workers as the bot's Client has. The fake client answers every Bot API
+call after a configurable delay, URL jobs are probed against the local
+mock file server. Reports per-handler latency, database and job store
+writes and API calls as JSON.
+
+The bot runs in a scratch directory, the real database is never touched.
+
+    python benchmarks/load_test.py --starts 10000 --urls 200 --files 200 --fsub-checks 200
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import importlib
+import itertools
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Before config is first imported, so the handlers take their backup path too
+os.environ.setdefault("BACKUP_CHANNEL_ID", "-1009999999999")
+
+from pyrogram.types import Message, CallbackQuery, User, Chat, Document
+from pyrogram.enums import ChatType, ChatMemberStatus
+from pyrogram.errors import UserNotParticipant
+from chunk_sizing import read_rss
+from pipeline_bench import percentile
+from mocks import MB, start_mock_process
+
+USER_ID_BASE = 5_000_000_000
+FSUB_CHANNEL_BASE = -1_009_000_000_000
+
+class FakeChatMember:
+    def __init__(self, status):
+        self.status = status
+
+class FakeChat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+        self.title = "Bench Channel"
+        self.invite_link = f"https://t.me/+bench{abs(chat_id)}"
+
+class FakeClient:
+    """
+    Stands in for the bot's Client: every Bot API call the handlers make
+    sleeps `latency` seconds, gets counted and returns a plausible object.
+    `miss_rate` is the share of force-subscribe checks that find the user
+    outside the channel
+    """
+
+    def __init__(self, latency: float = 0.0, miss_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.miss_rate = miss_rate
+        self.rng = random.Random(seed)
+        self.calls = Counter()
+        self.ids = itertools.count(1_000_000)
+
+    async def _call(self, method: str):
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _message(self, chat_id, text=None) -> Message:
+        return Message(
+            id=next(self.ids),
+            chat=Chat(id=chat_id, type=ChatType.PRIVATE, client=self),
+            text=text,
+            client=self
+        )
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._call("send_message")
+        return self._message(chat_id, text)
+
+    async def send_photo(self, chat_id, photo, caption=None, **kwargs):
+        await self._call("send_photo")
+        return self._message(chat_id, caption)
+
+    async def send_document(self, chat_id, document, **kwargs):
+        await self._call("send_document")
+        return self._message(chat_id)
+
+    async def copy_message(self, chat_id, from_chat_id, message_id, **kwargs):
+        await self._call("copy_message")
+        return self._message(chat_id)
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        await self._call("edit_message_text")
+        return self._message(chat_id, text)
+
+    async def answer_callback_query(self, callback_query_id, **kwargs):
+        await self._call("answer_callback_query")
+        return True
+
+    async def get_chat_member(self, chat_id, user_id):
+        await self._call("get_chat_member")
+        if self.rng.random() < self.miss_rate:
+            raise UserNotParticipant()
+        return FakeChatMember(ChatMemberStatus.MEMBER)
+
+    async def get_chat(self, chat_id):
+        await self._call("get_chat")
+        return FakeChat(chat_id)
+
+    async def export_chat_invite_link(self, chat_id):
+        await self._call("export_chat_invite_link")
+        return FakeChat(chat_id).invite_link
+
+# ================== SYNTHETIC UPDATES ==================
+
+def make_user(client, index: int) -> User:
+    return User(id=USER_ID_BASE + index, first_name=f"Load {index}", username=f"load_{index}", client=client)
+
+def make_message(client, user: User, message_id: int, **kwargs) -> Message:
+    chat = Chat(id=user.id, type=ChatType.PRIVATE, client=client)
+    return Message(id=message_id, from_user=user, chat=chat, client=client, **kwargs)
+
+def make_updates(bot, client, args, base_url: str) -> list:
+    """(handler name, handler, update) tuples in a shuffled burst"""
+    rng = random.Random(args.seed)
+    ids = itertools.count(1)
+    user = lambda: make_user(client, rng.randrange(args.users))
+    updates = []
+
+    for _ in range(args.starts):
+        message = make_message(client, user(), next(ids), text="/start")
+        message.command = ["start"]
+        updates.append(("start", bot.start, message))
+
+    for index in range(args.urls):
+        url = f"{base_url}/file/{args.file_size * MB}/load_{index % args.distinct_files}.bin"
+        updates.append(("url_handler", bot.url_handler, make_message(client, user(), next(ids), text=url)))
+
+    for index in range(args.files):
+        key = index % args.distinct_files
+        document = Document(
+            file_id=f"load_file_{index}",
+            file_unique_id=f"load_unique_{key}",
+            file_size=args.file_size * MB,
+            file_name=f"load_{key}.bin",
+            client=client
+        )
+        updates.append(("file_handler", bot.file_handler, make_message(client, user(), next(ids), document=document)))
+
+    for index in range(args.fsub_checks):
+        from_user = user()
+        callback = CallbackQuery(
+            client=client,
+            id=str(index),
+            from_user=from_user,
+            chat_instance=str(from_user.id),
+            message=make_message(client, from_user, next(ids), text="fsub"),
+            data="check_fsub"
+        )
+        updates.append(("check_fsub_callback", bot.check_fsub_callback, callback))
+
+    rng.shuffle(updates)
+    return updates
+
+# ================== INSTRUMENTATION ==================
+
+def count_calls(obj, name: str, stats: dict, key: str):
+    """Wrap an async method of `obj` to count calls and time spent"""
+    original = getattr(obj, name)
+
+    async def counted(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await original(*args, **kwargs)
+        finally:
+            stats[key] += 1
+            stats[f"{key}_seconds"] += time.perf_counter() - started
+
+    setattr(obj, name, counted)
+
+def summarize(values: list) -> dict:
+    return {
+        "p50": round(percentile(values, 50) * 1000, 2),
+        "p95": round(percentile(values, 95) * 1000, 2),
+        "p99": round(percentile(values, 99) * 1000, 2),
+        "max": round(max(values, default=0) * 1000, 2)
+    }
+
+async def dispatch(updates: list, workers: int) -> dict:
+    """Run the burst like Pyrogram's dispatcher: one queue, `workers` handler tasks"""
+    queue = asyncio.Queue()
+    enqueued = time.perf_counter()
+    for update in updates:
+        queue.put_nowait(update)
+
+    latency = defaultdict(list)   # since the burst arrived
+    service = defaultdict(list)   # handler run time only
+    errors = Counter()
+
+    async def worker():
+        while not queue.empty():
+            name, handler, update = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                await handler(update._client, update)
+            except Exception as e:
+                errors[f"{name}: {type(e).__name__}: {e}"] += 1
+            finished = time.perf_counter()
+            service[name].append(finished - started)
+            latency[name].append(finished - enqueued)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return {
+        "seconds": time.perf_counter() - enqueued,
+        "handlers": {
+            name: {
+                "count": len(service[name]),
+                "latency_ms": summarize(latency[name]),
+                "service_ms": summarize(service[name])
+            }
+            for name in sorted(service)
+        },
+        "errors": dict(errors.most_common(10))
+    }
+
+async def main(args):
+    workdir = tempfile.mkdtemp(prefix="gfbot_load_")
+    cwd = os.getcwd()
+    mock = start_mock_process(args.port) if args.urls else None
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        # Relative data files (database.json, jobs.json, downloads/) land in the scratch dir
+        os.chdir(workdir)
+        bot = importlib.import_module("bot")
+
+        if not args.flood_shield:
+            bot.flood_shield.allow = lambda user_id, media_group_id=None: True
+        bot.db.data["fsub_channels"] = [
+            {"id": FSUB_CHANNEL_BASE - i, "name": f"Bench {i}", "link": ""}
+            for i in range(args.fsub_channels)
+        ]
+        for index in range(args.existing_users):
+            bot.db.data["users"][str(USER_ID_BASE + index)] = {
+                "user_id": USER_ID_BASE + index, "first_name": f"Load {index}", "username": f"load_{index}",
+                "joined_date": "2026-01-01T00:00:00", "last_active": "2026-01-01T00:00:00",
+                "uploads_count": 0, "total_size": 0
+            }
+
+        stats = Counter()
+        count_calls(bot.db, "_save_db", stats, "db_writes")
+        count_calls(bot.job_store, "_save", stats, "job_store_writes")
+
+        client = FakeClient(args.latency, args.fsub_miss_rate, args.seed)
+        updates = make_updates(bot, client, args, base_url)
+        sender = asyncio.create_task(bot.backup_sender.run(client))
+
+        rss_before = read_rss()
+        result = await dispatch(updates, args.workers)
+        sender.cancel()
+
+        report = {
+            "benchmark": "handlers",
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "options": {
+                "workers": args.workers,
+                "users": args.users,
+                "existing_users": args.existing_users,
+                "api_latency": args.latency,
+                "fsub_channels": args.fsub_channels,
+                "fsub_miss_rate": args.fsub_miss_rate,
+                "flood_shield": args.flood_shield
+            },
+            "updates": len(updates),
+            "seconds": round(result["seconds"], 3),
+            "updates_per_second": round(len(updates) / result["seconds"], 1),
+            "handlers": result["handlers"],
+            "db_writes": stats["db_writes"],
+            "db_write_seconds": round(stats["db_writes_seconds"], 3),
+            "job_store_writes": stats["job_store_writes"],
+            "job_store_write_seconds": round(stats["job_store_writes_seconds"], 3),
+            "db_users": len(bot.db.data["users"]),
+            "queued_jobs": bot.scheduler.qsize(),
+            "backup_queue_depth": bot.backup_sender.queue.qsize(),
+            "flood_dropped": bot.flood_shield.dropped,
+            "api_calls": dict(client.calls),
+            "rss_mb": round(read_rss() / MB, 1),
+            "rss_growth_mb": round((read_rss() - rss_before) / MB, 1),
+            "errors": result["errors"]
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        if mock:
+            mock.terminate()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Push a burst of synthetic updates through the bot's handlers")
+    parser.add_argument("--starts", type=int, default=10000, help="/start messages in the burst")
+    parser.add_argument("--urls", type=int, default=0, help="URL messages in the burst")
+    parser.add_argument("--files", type=int, default=0, help="File messages in the burst")
+    parser.add_argument("--fsub-checks", type=int, default=0, help="check_fsub callback queries in the burst")
+    parser.add_argument("--users", type=int, default=10000, help="Distinct users sending the updates")
+    parser.add_argument("--existing-users", type=int, default=0, help="Users already in the database")
+    parser.add_argument("--distinct-files", type=int, default=50, help="Distinct files and URLs, repeats hit dedup")
+    parser.add_argument("--file-size", type=int, default=16, help="Size of files and URL downloads in MB")
+    parser.add_argument("--workers", type=int, default=10, help="Concurrent handlers, the bot's Client uses 10")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds every fake Bot API call takes")
+    parser.add_argument("--fsub-channels", type=int, default=1)
+    parser.add_argument("--fsub-miss-rate", type=float, default=0.1, help="Share of membership checks that fail")
+    parser.add_argument("--flood-shield", action="store_true", help="Keep the per-user and global rate limits")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8769)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the services the transfer pipeline talks to.
+A mock GoFile that speaks the /uploadfile contract, a file server with
+Range support for URL jobs, and a fake Pyrogram client whose
+stream_media serves Telegram files. Latency, bandwidth and failure rates
+are configurable so benchmarks can model slow or flaky servers.
+"""
+import os
+import time
+import uuid
+import random
+import socket
+import asyncio
+import multiprocessing
+from aiohttp import web
+
+MB = 1024 * 1024
+BLOCK = os.urandom(MB)
+
+class Throttle:
+    """Paces a byte stream to `bandwidth` bytes per second, 0 for no limit"""
+
+    def __init__(self, bandwidth: int = 0):
+        self.bandwidth = bandwidth
+        self.started = time.perf_counter()
+        self.bytes = 0
+
+    async def __call__(self, nbytes: int):
+        self.bytes += nbytes
+        if self.bandwidth:
+            ahead = self.bytes / self.bandwidth - (time.perf_counter() - self.started)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+
+def _parse_range(header: str, size: int):
+    start, _, end = header.replace("bytes=", "").partition("-")
+    if not start:
+        return max(size - int(end), 0), size - 1
+    return int(start), min(int(end) if end else size - 1, size - 1)
+
+def make_app(latency: float = 0.0, upload_bandwidth: int = 0, download_bandwidth: int = 0,
+             failure_rate: float = 0.0, seed: int = None):
+    """Mock GoFile (POST /uploadfile) and file server (GET /file/{size}/{name})"""
+    rng = random.Random(seed)
+    stats = {"uploads": 0, "failures": 0, "upload_bytes": 0, "download_bytes": 0}
+
+    async def upload(request):
+        await asyncio.sleep(latency)
+        if rng.random() < failure_rate:
+            stats["failures"] += 1
+            return web.json_response({"status": "error-serverBusy", "data": {}}, status=503)
+
+        fields = {}
+        file_name = None
+        received = 0
+        throttle = Throttle(upload_bandwidth)
+        reader = await request.multipart()
+        async for part in reader:
+            if part.filename is None:
+                fields[part.name] = await part.text()
+                continue
+            file_name = part.filename
+            while True:
+                data = await part.read_chunk(MB)
+                if not data:
+                    break
+                received += len(data)
+                await throttle(len(data))
+
+        if file_name is None:
+            return web.json_response({"status": "error-badRequest", "data": {}}, status=400)
+
+        stats["uploads"] += 1
+        stats["upload_bytes"] += received
+        content_id = uuid.uuid4().hex[:6]
+        return web.json_response({
+            "status": "ok",
+            "data": {
+                "downloadPage": f"https://gofile.io/d/{content_id}",
+                "id": content_id,
+                "name": file_name,
+                "size": received,
+                "parentFolder": fields.get("folderId", "")
+            }
+        })
+
+    async def download(request):
+        size = int(request.match_info["size"])
+        start, end = 0, size - 1
+        status = 200
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Content-Type": "application/octet-stream",
+            # Same URL, same bytes: a stable validator lets the bot dedup
+            "ETag": f'"{size}-{request.match_info["name"]}"'
+        }
+        if "Range" in request.headers:
+            start, end = _parse_range(request.headers["Range"], size)
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+
+        await asyncio.sleep(latency)
+        response = web.StreamResponse(status=status, headers=headers)
+        await response.prepare(request)
+        if request.method == "HEAD":
+            return response
+
+        throttle = Throttle(download_bandwidth)
+        position = start
+        while position <= end:
+            offset = position % MB
+            piece = BLOCK[offset:offset + min(MB - offset, end - position + 1)]
+            await response.write(piece)
+            position += len(piece)
+            stats["download_bytes"] += len(piece)
+            await throttle(len(piece))
+        await response.write_eof()
+        return response
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application(client_max_size=1 << 40)
+    app.router.add_post("/uploadfile", upload)
+    app.router.add_get("/file/{size}/{name}", download)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+def serve(port: int, **options):
+    """Run the mock services until the process is killed"""
+    web.run_app(make_app(**options), host="127.0.0.1", port=port, print=None, access_log=None)
+
+def start_mock_process(port: int, **options) -> multiprocessing.Process:
+    """Mock services in their own process, so they don't skew CPU and RSS numbers"""
+    process = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(port,), kwargs=options, daemon=True
+    )
+    process.start()
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError(f"Mock services did not come up on port {port}")
+
+# ================== FAKE TELEGRAM ==================
+
+class FakeMedia:
+    """The bits of a Pyrogram document the pipeline reads"""
+
+    def __init__(self, file_size: int, file_name: str):
+        self.file_size = file_size
+        self.file_name = file_name
+
+class FakeTelegramClient:
+    """
+    Serves stream_media like Pyrogram does: 1 MiB chunks, `offset` and
+    `limit` counted in chunks, with a delay per request and a bandwidth
+    cap per stream
+    """
+
+    def __init__(self, latency: float = 0.0, bandwidth: int = 0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.requests = 0
+
+    async def stream_media(self, message, offset: int = 0, limit: int = 0):
+        self.requests += 1
+        size = message.document.file_size
+        total = -(-size // MB)
+        last = total if not limit else min(total, offset + limit)
+
+        await asyncio.sleep(self.latency)
+        throttle = Throttle(self.bandwidth)
+        for index in range(offset, last):
+            chunk = BLOCK[:min(MB, size - index * MB)]
+            await throttle(len(chunk))
+            yield chunk
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+End-to-end transfer pipeline benchmark.
+Runs batches of URL or Telegram jobs through a fair scheduler and the
+same download and GoFile upload code the bot uses, against the local
+mock services in benchmarks/mocks.py. Every combination of source, file
+size and worker count is one case; the results are written as JSON so
+runs can be compared across commits.
+
+    python benchmarks/pipeline_bench.py --sizes 8,64 --concurrency 1,4 --output bench.json
+"""
+import os
+import sys
+import json
+import time
+import types
+import asyncio
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pipeline
+from helpers.scheduler import Job, FairScheduler
+from helpers.file_io import remove_file
+from chunk_sizing import RssSampler, read_rss
+from mocks import MB, FakeMedia, FakeTelegramClient, start_mock_process
+
+GB = 1024 * MB
+
+logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+
+def percentile(values: list, p: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+async def transfer(job, base_url: str, tg_client, workdir: str) -> str:
+    job.file_path = os.path.join(workdir, f"bench_{job.id}.bin")
+    try:
+        if job.type == "url":
+            status = await pipeline.download_url(job.source, job.file_path, job)
+            if status != 200:
+                raise RuntimeError(f"URL Error: {status}")
+        else:
+            await pipeline.download_tg_file(tg_client, job.source, job.file_path, job)
+        return await pipeline.upload_to_gofile(job.file_path, progress=job.touch)
+    finally:
+        await remove_file(job.file_path)
+
+async def run_case(source: str, size: int, concurrency: int, jobs: int,
+                   base_url: str, tg_client, workdir: str) -> dict:
+    scheduler = FairScheduler(max_inflight=jobs)
+    for index in range(jobs):
+        if source == "url":
+            job_source = f"{base_url}/file/{size}/bench_{index}.bin"
+        else:
+            job_source = types.SimpleNamespace(id=index, empty=False, document=FakeMedia(size, f"bench_{index}.bin"))
+        # One user per job, so the per-user limit doesn't serialize the batch
+        await scheduler.put(Job(source, job_source, None, None, index, file_size=size))
+
+    latencies = []
+    failed = 0
+    remaining = jobs
+
+    async def worker():
+        nonlocal failed, remaining
+        while remaining:
+            remaining -= 1
+            job = await scheduler.get()
+            try:
+                if not await transfer(job, base_url, tg_client, workdir):
+                    failed += 1
+            except Exception as e:
+                print(f"Job {job.id} failed: {e}", file=sys.stderr)
+                failed += 1
+            finally:
+                latencies.append(time.monotonic() - job.created_at)
+                await scheduler.done(job)
+
+    cpu_started = cpu_seconds()
+    async with RssSampler() as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+    cpu = cpu_seconds() - cpu_started
+
+    moved = size * (jobs - failed)
+    return {
+        "source": source,
+        "size_mb": size / MB,
+        "concurrency": concurrency,
+        "jobs": jobs,
+        "failed": failed,
+        "seconds": round(wall, 3),
+        "throughput_mbps": round(moved / MB / wall, 2),
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p99": round(percentile(latencies, 99), 3),
+        "peak_rss_growth_mb": round(rss.peak / MB, 1),
+        "rss_mb": round(read_rss() / MB, 1),
+        "cpu_seconds_per_gb": round(cpu / (moved / GB), 2) if moved else None
+    }
+
+async def main(args):
+    mock = start_mock_process(
+        args.port,
+        latency=args.latency,
+        upload_bandwidth=args.bandwidth * MB,
+        download_bandwidth=args.bandwidth * MB,
+        failure_rate=args.failure_rate,
+        seed=args.seed
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    pipeline.GOFILE_UPLOAD_URL = base_url + "/uploadfile"
+    tg_client = FakeTelegramClient(args.latency, args.bandwidth * MB)
+
+    cases = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="gfbot_bench_") as workdir:
+            for source in args.sources:
+                for size_mb in args.sizes:
+                    for concurrency in args.concurrency:
+                        jobs = args.jobs or concurrency * 2
+                        result = await run_case(source, size_mb * MB, concurrency, jobs, base_url, tg_client, workdir)
+                        cases.append(result)
+                        print(
+                            f"{source:>8} {size_mb:>6} MB x{concurrency:<3} {result['throughput_mbps']:>9.1f} MB/s "
+                            f"p50 {result['latency_p50']:.2f}s p99 {result['latency_p99']:.2f}s",
+                            file=sys.stderr
+                        )
+    finally:
+        mock.terminate()
+
+    report = {
+        "benchmark": "pipeline",
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {
+            "latency": args.latency,
+            "bandwidth_mbps": args.bandwidth,
+            "failure_rate": args.failure_rate
+        },
+        "cases": cases
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    list_of = lambda cast: lambda v: [cast(x) for x in v.split(",")]
+    parser = argparse.ArgumentParser(description="Benchmark the transfer pipeline against local mock services")
+    parser.add_argument("--sources", type=list_of(str), default=["url", "telegram"], help="url, telegram or both")
+    parser.add_argument("--sizes", type=list_of(int), default=[8, 64, 256], help="File sizes in MB")
+    parser.add_argument("--concurrency", type=list_of(int), default=[1, 4, 8], help="Worker counts")
+    parser.add_argument("--jobs", type=int, default=0, help="Jobs per case, twice the worker count by default")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before every mock response")
+    parser.add_argument("--bandwidth", type=int, default=0, help="Mock bandwidth per connection in MB/s, 0 for none")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of GoFile uploads that fail")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Startup profile.
+Imports bot.py in a fresh interpreter under `python -X importtime`, in a
+scratch directory with a synthetic database of --users users, then loads
+the database the way main() does. Reports the total import time, the
+slowest modules by cumulative and self time, the cost of the bot's own
+modules and the database load, as JSON.
+
+Time to first update needs a live Telegram connection; the running bot
+exports it as gfbot_time_to_first_update_seconds on /metrics.
+
+    python benchmarks/startup_profile.py --users 100000 --top 15
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that belong to the bot itself
+FIRST_PARTY = ("bot", "config", "database", "serializers", "pipeline", "worker", "helpers")
+
+CHILD = """
+import sys, json, time, asyncio
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import bot
+imported = time.perf_counter() - started
+started = time.perf_counter()
+asyncio.run(bot.db.load())
+loaded = time.perf_counter() - started
+print(json.dumps({{
+    "import_seconds": imported,
+    "bot_import_seconds": bot.IMPORT_SECONDS,
+    "db_load_seconds": loaded,
+    "db_users": len(bot.db.data["users"]),
+    "db_format": bot.db.codec.name
+}}))
+"""
+
+def parse_importtime(output: str) -> list:
+    """Rows of `-X importtime` as dicts with self and cumulative milliseconds"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000
+        })
+    return rows
+
+def is_first_party(module: str) -> bool:
+    return module.split(".")[0] in FIRST_PARTY
+
+def write_database(workdir: str, users: int):
+    sys.path.insert(0, ROOT)
+    from db_bench import make_data
+    from config import DATABASE_FILE
+    # The pre-serializer format, so the profile includes the upgrade path
+    with open(os.path.join(workdir, DATABASE_FILE), "w") as f:
+        json.dump(make_data(users), f, indent=2)
+
+def main(args):
+    workdir = tempfile.mkdtemp(prefix="gfbot_startup_")
+    try:
+        if args.users:
+            write_database(workdir, args.users)
+
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CHILD.format(root=ROOT)],
+            cwd=workdir, capture_output=True, text=True
+        )
+        wall = time.perf_counter() - started
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if result.returncode:
+        sys.exit(f"Importing the bot failed:\n{result.stderr[-2000:]}")
+
+    child = json.loads(result.stdout.strip().splitlines()[-1])
+    rows = parse_importtime(result.stderr)
+    first_party = [row for row in rows if is_first_party(row["module"])]
+    # Depth 1 is whatever bot.py (or the -c script) imports directly
+    direct = [row for row in rows if row["depth"] == 1]
+
+    report = {
+        "benchmark": "startup",
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "db_users": child["db_users"],
+        "db_format": child["db_format"],
+        "process_seconds": round(wall, 3),
+        "import_seconds": round(child["import_seconds"], 3),
+        "bot_import_seconds": round(child["bot_import_seconds"], 3),
+        "db_load_seconds": round(child["db_load_seconds"], 3),
+        "first_party_self_ms": round(sum(row["self_ms"] for row in first_party), 1),
+        "slowest_direct_imports": sorted(direct, key=lambda r: -r["cumulative_ms"])[:args.top],
+        "slowest_self": sorted(rows, key=lambda r: -r["self_ms"])[:args.top],
+        "first_party": sorted(first_party, key=lambda r: -r["self_ms"])[:args.top]
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile the bot's import time and database load")
+    parser.add_argument("--users", type=int, default=10000, help="Users in the synthetic database, 0 for none")
+    parser.add_argument("--top", type=int, default=15, help="Modules to list per ranking")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    main(parser.parse_args())
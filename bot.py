@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
+import time
+# Process start, before the heavy imports below, for startup metrics
+STARTED_AT = time.monotonic()
+
+import io
 import os
 import aiohttp
 import asyncio
-import time
-import mimetypes
 import logging
 import uvloop
 import random
+import socket
+import multiprocessing
 from datetime import datetime
 from pyrogram import Client, filters, idle
 from pyrogram.types import (
@@ -16,7 +21,6 @@ from pyrogram.types import (
     Message
 )
 from pyrogram.errors import FloodWait, UserNotParticipant
-from asyncio import Queue, Lock
 from aiohttp import web
 
 # ================== SPEED OPTIMIZATION ==================
@@ -26,13 +30,39 @@ uvloop.install()
 from config import *
 from database import db
 from helpers import check_force_sub, get_invite_links, broadcast_message
+from helpers.rate_limit import flood_shield
+from helpers.scheduler import Job, JobCancelled, scheduler
+from helpers.stages import StageTimeout, run_stage
+from helpers.chunking import chunk_sizer
+from helpers.file_io import remove_file, run_io
+from helpers.disk_space import disk_space
+from helpers.backup_sender import backup_sender
+from helpers.backup_digest import backup_digest
+from helpers.broker import get_broker, IPCBroker
+from helpers.job_store import job_store
+from helpers.dedup import dedup_index, get_tg_key, get_url_key
+from helpers.hashing import hash_stats
+from helpers.tracing import tracer
+from helpers.metrics import (
+    registry,
+    Gauge,
+    STAGE_SECONDS,
+    DB_SAVE_SECONDS,
+    observe_transfer,
+    count_floodwait,
+    install_floodwait_hook
+)
+from helpers.loop_monitor import loop_monitor
 from helpers.force_sub import (
     get_fsub_keyboard, 
     get_fsub_message,
     get_random_bypass_message,
     get_random_left_message
 )
-from helpers.decorators import admin_only, owner_only, not_banned
+from helpers.decorators import admin_only, owner_only, not_banned, rate_limited
+from pipeline import get_url_file_name, get_download_path, download_tg_file, download_url, upload_to_gofile
+
+IMPORT_SECONDS = time.monotonic() - STARTED_AT
 
 # ================== SETUP ==================
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
@@ -43,18 +73,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# ================== METRICS ==================
+install_floodwait_hook()
+db.on_save = DB_SAVE_SECONDS.observe
+
+Gauge("gfbot_queue_depth", "Jobs waiting in the scheduler", func=lambda: scheduler.qsize())
+Gauge("gfbot_active_workers", "Jobs currently being transferred", func=lambda: len(scheduler.running))
+Gauge("gfbot_dedup_hits", "Dedup index lookups that reused a link", func=lambda: dedup_index.hits)
+Gauge("gfbot_dedup_misses", "Dedup index lookups that found nothing", func=lambda: dedup_index.misses)
+Gauge("gfbot_flood_dropped_updates", "Updates dropped by the flood shield", func=lambda: flood_shield.dropped)
+Gauge("gfbot_hash_throughput_bytes_per_second", "Content hashing speed", func=lambda: hash_stats.throughput)
+Gauge("gfbot_backup_queue_depth", "Backup channel posts waiting to be sent", func=lambda: backup_sender.queue.qsize())
+Gauge("gfbot_backup_failed_posts", "Backup channel posts given up on", func=lambda: backup_sender.failed)
+Gauge("gfbot_disk_reserved_bytes", "Download directory space reserved by running jobs", func=lambda: disk_space.reserved)
+Gauge("gfbot_disk_waiting_jobs", "Queued jobs held back for disk space", func=lambda: len(disk_space.waiting))
+Gauge("gfbot_chunk_size_bytes", "Current adaptive transfer chunk size", func=lambda: chunk_sizer.size)
+Gauge("gfbot_chunk_throughput_bytes_per_second", "Smoothed per-chunk transfer speed", func=lambda: chunk_sizer.throughput)
+Gauge("gfbot_startup_import_seconds", "Seconds spent importing modules at startup", func=lambda: IMPORT_SECONDS)
+Gauge("gfbot_db_load_seconds", "Seconds the database file took to load", func=lambda: db.load_seconds)
+Gauge("gfbot_time_to_first_update_seconds", "Seconds from process start until the first update was handled", func=lambda: first_update_seconds or 0)
+
 # ================== BOT INSTANCE ==================
 app = Client(
     "ultimate_gofile_bot",
     api_id=API_ID,
     api_hash=API_HASH,
     bot_token=BOT_TOKEN,
-    workers=10
+    workers=10,
+    # Every worker may run several part streams at once
+    max_concurrent_transmissions=WORKER_COUNT * TG_DOWNLOAD_STREAMS
 )
 
-download_queue = Queue()
-processing_lock = Lock()
-
 # ================== HELPER FUNCTIONS ==================
 
 def human_readable_size(size):
@@ -70,6 +119,23 @@ def get_current_time():
 async def is_admin(user_id: int) -> bool:
     return user_id in ADMIN_IDS or user_id == OWNER_ID
 
+# ================== STARTUP ==================
+
+# The database loads in the background while the bot connects, updates
+# that arrive first wait here (group -1 runs before every handler)
+first_update_seconds = None
+
+@app.on_message(group=-1)
+@app.on_callback_query(group=-1)
+async def wait_until_ready(client: Client, update):
+    global first_update_seconds
+    if not db.loaded.is_set():
+        await db.loaded.wait()
+
+    if first_update_seconds is None:
+        first_update_seconds = time.monotonic() - STARTED_AT
+        logger.info(f"First update handled {first_update_seconds:.2f}s after start")
+
 # ================== FORCE SUBSCRIBE MIDDLEWARE ==================
 
 async def force_sub_check(client: Client, message: Message) -> bool:
@@ -100,7 +166,8 @@ async def force_sub_check(client: Client, message: Message) -> bool:
         return False
     
     # Check force subscribe
-    is_subscribed, missing_channels = await check_force_sub(client, user_id)
+    with STAGE_SECONDS.labels("fsub_check").time():
+        is_subscribed, missing_channels = await check_force_sub(client, user_id)
     
     if not is_subscribed:
         invite_links = await get_invite_links(client, missing_channels)
@@ -118,6 +185,7 @@ async def force_sub_check(client: Client, message: Message) -> bool:
 # ================== CALLBACK HANDLER FOR FSUB ==================
 
 @app.on_callback_query(filters.regex("^check_fsub$"))
+@rate_limited
 async def check_fsub_callback(client: Client, callback: CallbackQuery):
     """Handle force subscribe verification"""
     user_id = callback.from_user.id
@@ -149,6 +217,7 @@ async def check_fsub_callback(client: Client, callback: CallbackQuery):
 # ================== START COMMAND ==================
 
 @app.on_message(filters.command("start") & filters.private)
+@rate_limited
 async def start(client: Client, message: Message):
     user = message.from_user
     
@@ -225,6 +294,7 @@ async def start(client: Client, message: Message):
 # ================== HELP COMMAND ==================
 
 @app.on_message(filters.command("help") & filters.private)
+@rate_limited
 async def help_command(client: Client, message: Message):
     if not await force_sub_check(client, message):
         return
@@ -254,6 +324,7 @@ async def help_command(client: Client, message: Message):
     await message.reply_text(help_text, reply_markup=InlineKeyboardMarkup(buttons))
 
 @app.on_callback_query(filters.regex("^help_menu$"))
+@rate_limited
 async def help_menu_callback(client: Client, callback: CallbackQuery):
     help_text = (
         "📖 **Help & Commands**\n\n"
@@ -278,6 +349,7 @@ async def help_menu_callback(client: Client, callback: CallbackQuery):
     await callback.message.edit_text(help_text, reply_markup=InlineKeyboardMarkup(buttons))
 
 @app.on_callback_query(filters.regex("^go_start$"))
+@rate_limited
 async def go_start_callback(client: Client, callback: CallbackQuery):
     user = callback.from_user
     
@@ -315,6 +387,7 @@ async def go_start_callback(client: Client, callback: CallbackQuery):
 # ================== USER STATS ==================
 
 @app.on_message(filters.command("stats") & filters.private)
+@rate_limited
 async def user_stats_command(client: Client, message: Message):
     if not await force_sub_check(client, message):
         return
@@ -339,6 +412,7 @@ async def user_stats_command(client: Client, message: Message):
     await message.reply_text(stats_text)
 
 @app.on_callback_query(filters.regex("^my_stats$"))
+@rate_limited
 async def my_stats_callback(client: Client, callback: CallbackQuery):
     user_id = callback.from_user.id
     user_data = await db.get_user(user_id)
@@ -364,6 +438,7 @@ async def my_stats_callback(client: Client, callback: CallbackQuery):
 # ================== PING COMMAND ==================
 
 @app.on_message(filters.command("ping") & filters.private)
+@rate_limited
 async def ping_command(client: Client, message: Message):
     start_time = time.time()
     msg = await message.reply_text("🏓 Pinging...")
@@ -373,6 +448,7 @@ async def ping_command(client: Client, message: Message):
 # ================== ABOUT COMMAND ==================
 
 @app.on_message(filters.command("about") & filters.private)
+@rate_limited
 async def about_command(client: Client, message: Message):
     if not await force_sub_check(client, message):
         return
@@ -395,6 +471,7 @@ async def about_command(client: Client, message: Message):
 # ================== ADMIN PANEL ==================
 
 @app.on_callback_query(filters.regex("^admin_panel$"))
+@rate_limited
 @admin_only
 async def admin_panel_callback(client: Client, callback: CallbackQuery):
     bot_stats = await db.get_bot_stats()
@@ -430,6 +507,7 @@ async def admin_panel_callback(client: Client, callback: CallbackQuery):
 
 # ----- BROADCAST -----
 @app.on_message(filters.command("broadcast") & filters.private)
+@rate_limited
 @admin_only
 async def broadcast_command(client: Client, message: Message):
     if not message.reply_to_message:
@@ -457,6 +535,7 @@ async def broadcast_command(client: Client, message: Message):
     )
 
 @app.on_callback_query(filters.regex("^admin_broadcast$"))
+@rate_limited
 @admin_only
 async def admin_broadcast_callback(client: Client, callback: CallbackQuery):
     text = (
@@ -473,6 +552,7 @@ async def admin_broadcast_callback(client: Client, callback: CallbackQuery):
 
 # ----- USERS MANAGEMENT -----
 @app.on_message(filters.command("users") & filters.private)
+@rate_limited
 @admin_only
 async def users_command(client: Client, message: Message):
     stats = await db.get_bot_stats()
@@ -492,6 +572,7 @@ async def users_command(client: Client, message: Message):
     await message.reply_text(text)
 
 @app.on_callback_query(filters.regex("^admin_users$"))
+@rate_limited
 @admin_only
 async def admin_users_callback(client: Client, callback: CallbackQuery):
     stats = await db.get_bot_stats()
@@ -519,6 +600,7 @@ async def admin_users_callback(client: Client, callback: CallbackQuery):
     await callback.message.edit_text(text, reply_markup=InlineKeyboardMarkup(buttons))
 
 @app.on_message(filters.command("ban") & filters.private)
+@rate_limited
 @admin_only
 async def ban_command(client: Client, message: Message):
     if len(message.text.split()) < 2:
@@ -539,6 +621,7 @@ async def ban_command(client: Client, message: Message):
     await message.reply_text(f"✅ User `{user_id}` has been **banned**!")
 
 @app.on_message(filters.command("unban") & filters.private)
+@rate_limited
 @admin_only
 async def unban_command(client: Client, message: Message):
     if len(message.text.split()) < 2:
@@ -552,9 +635,11 @@ async def unban_command(client: Client, message: Message):
         return
     
     await db.unban_user(user_id)
+    flood_shield.unban(user_id)
     await message.reply_text(f"✅ User `{user_id}` has been **unbanned**!")
 
 @app.on_message(filters.command("banned") & filters.private)
+@rate_limited
 @admin_only
 async def banned_list_command(client: Client, message: Message):
     banned = await db.get_banned_users()
@@ -573,6 +658,7 @@ async def banned_list_command(client: Client, message: Message):
     await message.reply_text(text)
 
 @app.on_message(filters.command("user") & filters.private)
+@rate_limited
 @admin_only
 async def user_info_command(client: Client, message: Message):
     if len(message.text.split()) < 2:
@@ -608,6 +694,7 @@ async def user_info_command(client: Client, message: Message):
 
 # ----- FSUB MANAGEMENT -----
 @app.on_message(filters.command("addfsub") & filters.private)
+@rate_limited
 @admin_only
 async def add_fsub_command(client: Client, message: Message):
     """
@@ -656,6 +743,7 @@ async def add_fsub_command(client: Client, message: Message):
         await message.reply_text("❌ Channel already exists!")
 
 @app.on_message(filters.command("remfsub") & filters.private)
+@rate_limited
 @admin_only
 async def remove_fsub_command(client: Client, message: Message):
     if len(message.text.split()) < 2:
@@ -676,6 +764,7 @@ async def remove_fsub_command(client: Client, message: Message):
         await message.reply_text("❌ Channel not found in FSub list!")
 
 @app.on_message(filters.command("fsub") & filters.private)
+@rate_limited
 @admin_only
 async def fsub_list_command(client: Client, message: Message):
     channels = await db.get_fsub_channels()
@@ -712,6 +801,7 @@ async def fsub_list_command(client: Client, message: Message):
     await message.reply_text(text, reply_markup=InlineKeyboardMarkup(buttons))
 
 @app.on_callback_query(filters.regex("^admin_fsub$"))
+@rate_limited
 @admin_only
 async def admin_fsub_callback(client: Client, callback: CallbackQuery):
     channels = await db.get_fsub_channels()
@@ -745,6 +835,7 @@ async def admin_fsub_callback(client: Client, callback: CallbackQuery):
     await callback.message.edit_text(text, reply_markup=InlineKeyboardMarkup(buttons))
 
 @app.on_callback_query(filters.regex("^toggle_fsub$"))
+@rate_limited
 @admin_only
 async def toggle_fsub_callback(client: Client, callback: CallbackQuery):
     current = await db.is_fsub_enabled()
@@ -758,6 +849,7 @@ async def toggle_fsub_callback(client: Client, callback: CallbackQuery):
 
 # ----- ADS MANAGEMENT -----
 @app.on_message(filters.command("setad") & filters.private)
+@rate_limited
 @admin_only
 async def set_ad_command(client: Client, message: Message):
     """
@@ -795,12 +887,14 @@ async def set_ad_command(client: Client, message: Message):
     )
 
 @app.on_message(filters.command("delad") & filters.private)
+@rate_limited
 @admin_only
 async def delete_ad_command(client: Client, message: Message):
     await db.set_ads(False, "", "", "")
     await message.reply_text("✅ Advertisement deleted!")
 
 @app.on_message(filters.command("togglead") & filters.private)
+@rate_limited
 @admin_only
 async def toggle_ad_command(client: Client, message: Message):
     ads = await db.get_ads()
@@ -810,6 +904,7 @@ async def toggle_ad_command(client: Client, message: Message):
     await message.reply_text(f"✅ Ads {status}")
 
 @app.on_callback_query(filters.regex("^admin_ads$"))
+@rate_limited
 @admin_only
 async def admin_ads_callback(client: Client, callback: CallbackQuery):
     ads = await db.get_ads()
@@ -839,6 +934,7 @@ async def admin_ads_callback(client: Client, callback: CallbackQuery):
     await callback.message.edit_text(text, reply_markup=InlineKeyboardMarkup(buttons))
 
 @app.on_callback_query(filters.regex("^toggle_ads_btn$"))
+@rate_limited
 @admin_only
 async def toggle_ads_btn_callback(client: Client, callback: CallbackQuery):
     ads = await db.get_ads()
@@ -849,6 +945,7 @@ async def toggle_ads_btn_callback(client: Client, callback: CallbackQuery):
 
 # ----- SETTINGS -----
 @app.on_callback_query(filters.regex("^admin_settings$"))
+@rate_limited
 @admin_only
 async def admin_settings_callback(client: Client, callback: CallbackQuery):
     is_maintenance = await db.is_maintenance()
@@ -875,6 +972,7 @@ async def admin_settings_callback(client: Client, callback: CallbackQuery):
     await callback.message.edit_text(text, reply_markup=InlineKeyboardMarkup(buttons))
 
 @app.on_callback_query(filters.regex("^toggle_maintenance$"))
+@rate_limited
 @admin_only
 async def toggle_maintenance_callback(client: Client, callback: CallbackQuery):
     current = await db.is_maintenance()
@@ -884,6 +982,7 @@ async def toggle_maintenance_callback(client: Client, callback: CallbackQuery):
     await admin_settings_callback(client, callback)
 
 @app.on_message(filters.command("maintenance") & filters.private)
+@rate_limited
 @admin_only
 async def maintenance_command(client: Client, message: Message):
     args = message.text.split()
@@ -908,6 +1007,7 @@ async def maintenance_command(client: Client, message: Message):
         await message.reply_text("❌ Use: `/maintenance on` or `/maintenance off`")
 
 @app.on_message(filters.command("setwelcome") & filters.private)
+@rate_limited
 @admin_only
 async def set_welcome_command(client: Client, message: Message):
     if len(message.text.split(None, 1)) < 2:
@@ -926,6 +1026,7 @@ async def set_welcome_command(client: Client, message: Message):
     await message.reply_text(f"✅ Welcome message set!\n\n**Preview:**\n{welcome_msg}")
 
 @app.on_message(filters.command("resetwelcome") & filters.private)
+@rate_limited
 @admin_only
 async def reset_welcome_command(client: Client, message: Message):
     await db.set_welcome_message("")
@@ -933,6 +1034,7 @@ async def reset_welcome_command(client: Client, message: Message):
 
 # ----- STATS -----
 @app.on_callback_query(filters.regex("^admin_stats_detail$"))
+@rate_limited
 @admin_only
 async def admin_stats_detail_callback(client: Client, callback: CallbackQuery):
     stats = await db.get_bot_stats()
@@ -950,38 +1052,138 @@ async def admin_stats_detail_callback(client: Client, callback: CallbackQuery):
     buttons = [[InlineKeyboardButton("🔙 Back", callback_data="admin_panel")]]
     await callback.message.edit_text(text, reply_markup=InlineKeyboardMarkup(buttons))
 
+# ----- TRACES -----
+@app.on_message(filters.command("trace") & filters.private)
+@rate_limited
+@admin_only
+async def trace_command(client: Client, message: Message):
+    args = message.text.split()[1:]
+
+    if not args:
+        await message.reply_text(
+            "🧭 **Job Traces**\n\n"
+            "• `/trace <job_id>` - Show a job's timeline\n"
+            "• `/trace export` - Download recent traces as JSONL"
+        )
+        return
+
+    if args[0] == "export":
+        export = io.BytesIO(tracer.export_jsonl().encode())
+        export.name = f"traces_{int(time.time())}.jsonl"
+        await message.reply_document(export, caption="🧭 **Recent job traces**")
+        return
+
+    trace = tracer.get(args[0])
+    if not trace:
+        await message.reply_text("❌ No trace found for that job!")
+        return
+
+    text = (
+        f"🧭 **Trace** `{trace.id}`\n\n"
+        f"📌 **Status:** {trace.status}\n"
+        f"⏱ **Total:** `{(trace.end or time.time()) - trace.start:.2f}s`\n\n"
+    )
+    for span in trace.spans:
+        attrs = ", ".join(f"{k}={v}" for k, v in span.attributes.items())
+        text += f"• **{span.name}** `{span.duration:.2f}s`"
+        text += f"\n   `{attrs}`\n" if attrs else "\n"
+        if span.error:
+            text += f"   ❌ `{span.error}`\n"
+
+    await message.reply_text(text[:4096])
+
 # ================== IMMEDIATE BACKUP ==================
 
-async def immediate_backup(client, message, is_url=False, url_text=None):
-    """Step 1: Immediately forward content to backup channel before processing."""
+def immediate_backup(message, is_url=False, url_text=None, trace_id=None):
+    """Step 1: Queue the content for the backup channel before processing."""
     if not BACKUP_CHANNEL_ID:
         return
 
-    try:
-        user_info = (
-            f"#INCOMING_REQUEST\n"
-            f"👤 User: {message.from_user.first_name} (ID: `{message.from_user.id}`)\n"
-            f"🕒 Time: {get_current_time()}\n"
+    user = message.from_user
+    user_info = (
+        f"#INCOMING_REQUEST\n"
+        f"👤 User: {user.first_name} (ID: `{user.id}`)\n"
+        f"🕒 Time: {get_current_time()}\n"
+    )
+    entry = {
+        "time": get_current_time(),
+        "user_id": user.id,
+        "first_name": user.first_name,
+        "username": user.username
+    }
+
+    # Sent by the background sender, the user's job doesn't wait for it
+    if is_url:
+        backup_digest.post(
+            {"type": "incoming_url", **entry, "source": url_text},
+            f"{user_info}🔗 **URL Source:**\n`{url_text}`",
+            stage="backup",
+            trace_id=trace_id
+        )
+    elif BACKUP_COPY_FILES:
+        backup_sender.copy_message(
+            BACKUP_CHANNEL_ID,
+            message.chat.id,
+            message.id,
+            caption=f"{user_info}\n⬇️ **Original File Backup**",
+            trace_id=trace_id
+        )
+    else:
+        media = message.document or message.video or message.audio or message.photo
+        file_name = getattr(media, "file_name", "file")
+        file_size = getattr(media, "file_size", 0)
+        backup_digest.post(
+            {"type": "incoming_file", **entry, "file_name": file_name, "size": file_size},
+            f"{user_info}📄 **File:** `{file_name}` ({human_readable_size(file_size)})",
+            stage="backup",
+            trace_id=trace_id
         )
 
-        if is_url:
-            await client.send_message(
-                BACKUP_CHANNEL_ID,
-                f"{user_info}🔗 **URL Source:**\n`{url_text}`"
-            )
-        else:
-            await client.copy_message(
-                chat_id=BACKUP_CHANNEL_ID,
-                from_chat_id=message.chat.id,
-                message_id=message.id,
-                caption=f"{user_info}\n⬇️ **Original File Backup**"
-            )
+# ================== URL HANDLING ==================
+
+async def probe_url(url):
+    """HEAD the URL before queueing, returns (size, etag, last_modified) with 0/"" if unknown"""
+    try:
+        timeout = aiohttp.ClientTimeout(total=URL_PROBE_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.head(url, allow_redirects=True) as response:
+                if response.status == 200:
+                    return (
+                        int(response.headers.get("Content-Length", 0)),
+                        response.headers.get("ETag", ""),
+                        response.headers.get("Last-Modified", "")
+                    )
     except Exception as e:
-        logger.error(f"Immediate Backup Failed: {e}")
+        logger.debug(f"URL probe failed for {url}: {e}")
+    return 0, "", ""
 
-# ================== URL HANDLING ==================
+async def send_status(message, job, text, **kwargs):
+    """Edit the job's status message, or reply with one if it has none yet"""
+    if job.status_msg:
+        await job.status_msg.edit_text(text, **kwargs)
+    else:
+        job.status_msg = await message.reply_text(text, **kwargs)
+
+async def retry_floodwait(source, func, *args, attempts=3, **kwargs):
+    """Call an API method, sleeping through FloodWaits instead of giving up"""
+    for attempt in range(attempts):
+        try:
+            return await func(*args, **kwargs)
+        except FloodWait as e:
+            count_floodwait(source, e.value)
+            if attempt == attempts - 1:
+                raise
+            await asyncio.sleep(e.value)
+
+async def reply_from_cache(message, job, entry, source):
+    """Answer straight from the dedup index, no transfer needed"""
+    await finish_upload(
+        message, entry["file_size"], entry["file_name"],
+        source, job, entry["link"], cached=True
+    )
 
-@app.on_message(filters.text & filters.private & ~filters.command(["start", "help", "stats", "ping", "about", "broadcast", "users", "ban", "unban", "banned", "user", "addfsub", "remfsub", "fsub", "setad", "delad", "togglead", "maintenance", "setwelcome", "resetwelcome", "export"]))
+@app.on_message(filters.text & filters.private & ~filters.command(["start", "help", "stats", "ping", "about", "broadcast", "users", "ban", "unban", "banned", "user", "addfsub", "remfsub", "fsub", "setad", "delad", "togglead", "maintenance", "setwelcome", "resetwelcome", "export", "trace"]))
+@rate_limited
 async def url_handler(client: Client, message: Message):
     text = message.text.strip()
     
@@ -992,21 +1194,43 @@ async def url_handler(client: Client, message: Message):
     if not await force_sub_check(client, message):
         return
 
-    # 1. IMMEDIATE BACKUP
-    await immediate_backup(client, message, is_url=True, url_text=text)
+    user_id = message.from_user.id
+    priority = await is_admin(user_id)
+    job = Job("url", text, message, None, user_id, priority=priority)
+    tracer.start(job.id, type="url", user_id=user_id, url=text)
+    trace_token = tracer.activate(job.id)
+    try:
+        # 1. IMMEDIATE BACKUP
+        immediate_backup(message, is_url=True, url_text=text, trace_id=job.id)
+
+        # Answer right away, the probe can take up to URL_PROBE_TIMEOUT
+        job.status_msg = await message.reply_text(
+            "🔗 **URL Detected!**\n\n"
+            "🔍 Checking the link..."
+        )
 
-    msg = await message.reply_text(
-        "🔗 **URL Detected!**\n\n"
-        "🚀 Queued for High-Speed Processing...\n"
-        "⏳ Please wait..."
-    )
-    await download_queue.put(("url", text, message, msg))
-    
-    asyncio.create_task(process_queue(client))
+        # Known size lets small downloads skip ahead of huge ones
+        with tracer.span("probe") as span:
+            job.file_size, etag, last_modified = await probe_url(text)
+            span.set(size=job.file_size, etag=etag, last_modified=last_modified)
+
+        job.dedup_key = get_url_key(text, etag, job.file_size, last_modified)
+        with tracer.span("dedup_lookup") as span:
+            cached = await dedup_index.lookup(job.dedup_key)
+            span.set(hit=bool(cached))
+        if cached:
+            await reply_from_cache(message, job, cached, "HTTP URL")
+            tracer.finish(job.id, "cached")
+            return
+
+        await enqueue_job(message, job, text)
+    finally:
+        tracer.deactivate(trace_token)
 
 # ================== FILE HANDLING ==================
 
 @app.on_message((filters.document | filters.video | filters.audio | filters.photo) & filters.private)
+@rate_limited
 async def file_handler(client: Client, message: Message):
     if message.chat.id == BACKUP_CHANNEL_ID:
         return
@@ -1015,202 +1239,661 @@ async def file_handler(client: Client, message: Message):
     if not await force_sub_check(client, message):
         return
 
-    # 1. IMMEDIATE BACKUP
-    await immediate_backup(client, message, is_url=False)
-
     media = message.document or message.video or message.audio or message.photo
     
     file_size = getattr(media, 'file_size', 0)
     file_name = getattr(media, 'file_name', 'file')
-    
-    msg = await message.reply_text(
+
+    user_id = message.from_user.id
+    priority = await is_admin(user_id)
+    job = Job("file", media, message, None, user_id, priority=priority, file_size=file_size)
+    tracer.start(job.id, type="file", user_id=user_id, file_name=file_name, size=file_size)
+    trace_token = tracer.activate(job.id)
+    try:
+        # 1. IMMEDIATE BACKUP
+        immediate_backup(message, is_url=False, trace_id=job.id)
+
+        job.dedup_key = get_tg_key(media)
+        with tracer.span("dedup_lookup") as span:
+            cached = await dedup_index.lookup(job.dedup_key)
+            span.set(hit=bool(cached))
+        if cached:
+            await reply_from_cache(message, job, cached, "Telegram File")
+            tracer.finish(job.id, "cached")
+            return
+
+        await enqueue_job(message, job, file_name)
+    finally:
+        tracer.deactivate(trace_token)
+
+# ================== QUEUE PROCESSOR ==================
+
+def get_queue_text(job_type, name, file_size, position):
+    if job_type == "url":
+        size_line = f"📦 **Size:** `{human_readable_size(file_size)}`\n" if file_size else ""
+        return (
+            "🔗 **URL Detected!**\n\n"
+            f"{size_line}"
+            "🚀 Queued for High-Speed Processing...\n"
+            f"📋 **Queue Position:** `#{position}`\n"
+            "⏳ Please wait..."
+        )
+    return (
         f"📁 **File Detected!**\n\n"
-        f"📄 **Name:** `{file_name}`\n"
+        f"📄 **Name:** `{name}`\n"
         f"📦 **Size:** `{human_readable_size(file_size)}`\n\n"
-        f"🚀 Queued for High-Speed Processing..."
+        f"🚀 Queued for High-Speed Processing...\n"
+        f"📋 **Queue Position:** `#{position}`"
     )
-    await download_queue.put(("file", media, message, msg))
-    
-    asyncio.create_task(process_queue(client))
 
-# ================== QUEUE PROCESSOR ==================
+def get_attached_text(name):
+    return (
+        "🔗 **Already In Progress!**\n\n"
+        f"📄 `{name}`\n\n"
+        "⚡ Someone sent the same file moments ago.\n"
+        "⏳ You'll get the link as soon as that transfer finishes."
+    )
+
+async def enqueue_job(message, job, name):
+    """Reply with a status message and queue the job, or attach it to an identical one"""
+    if not disk_space.fits(job):
+        text = (
+            f"❌ **File Too Large!**\n\n"
+            f"📦 **Size:** `{human_readable_size(job.file_size)}`\n"
+            f"💾 The server's disk can hold at most `{human_readable_size(max(disk_space.capacity(), 0))}`."
+        )
+        await send_status(message, job, text)
+        tracer.finish(job.id, "rejected")
+        return
+
+    if scheduler.get_flight(job.dedup_key):
+        await send_status(
+            message, job,
+            get_attached_text(name),
+            reply_markup=get_cancel_keyboard(job)
+        )
+        # The leader may have finished while we were replying
+        if scheduler.attach(job):
+            tracer.annotate_trace(job.id, attached_to=scheduler.get_flight(job.dedup_key).id)
+            await job_store.add(job)
+            return
+
+    position = scheduler.estimate_position(job.user_id, job.priority, job.file_size)
+    text = get_queue_text(job.type, name, job.file_size, position)
+
+    await send_status(message, job, text, reply_markup=get_cancel_keyboard(job))
+
+    job.last_position = position
+    job.enqueued_at = time.time()
+    await job_store.add(job)
+    await scheduler.put(job)
+
+async def settle_followers(job):
+    """Fan a finished job's result out to every attached identical job"""
+    followers, job.followers = job.followers, []
+    if not followers:
+        return
+
+    # Leader was cancelled: the first follower takes over the transfer
+    if job.cancelled and not job.result:
+        leader, leader.followers = followers[0], followers[1:]
+        name = leader.source if leader.type == "url" else getattr(leader.source, "file_name", "file")
+        leader.last_position = await scheduler.put(leader)
+        try:
+            await leader.status_msg.edit_text(
+                get_queue_text(leader.type, name, leader.file_size, leader.last_position),
+                reply_markup=get_cancel_keyboard(leader)
+            )
+        except Exception as e:
+            logger.error(f"Could not update promoted job {leader.id}: {e}")
+        return
+
+    for follower in followers:
+        try:
+            if job.result:
+                # Same stats, reply and upload log as the leader, minus the transfer
+                file_name, file_size, source, link = job.result
+                await finish_upload(follower.message, file_size, file_name, source, follower, link, cached=True)
+            else:
+                await retry_floodwait(
+                    "fan_out", follower.status_msg.edit_text,
+                    "❌ **Transfer Failed!**\n\n"
+                    "The shared transfer for this file did not finish.\n"
+                    "Please send it again."
+                )
+        except Exception as e:
+            logger.error(f"Could not notify attached job {follower.id}: {e}")
+        finally:
+            tracer.finish(follower.id, "coalesced" if job.result else "failed")
+            await job_store.remove(follower)
+
+def get_cancel_keyboard(job):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("❌ Cancel", callback_data=f"cancel_job_{job.id}")]
+    ])
+
+async def run_job(client, job):
+    if broker:
+        await run_remote_job(client, job)
+    elif job.type == "file":
+        await process_tg_file(client, job.source, job.message, job.status_msg, job)
+    elif job.type == "url":
+        await process_url_file(client, job.source, job.message, job.status_msg, job)
+
+async def run_queued_job(client, job):
+    """Run one job the scheduler handed out, then clean up after it"""
+    STAGE_SECONDS.labels("queue_wait").observe(job.started_at - job.created_at)
+
+    trace = tracer.ensure(job.id, type=job.type, user_id=job.user_id)
+    trace.add_span("queue", job.enqueued_at or time.time(), lane=job.lane)
+    trace_token = tracer.activate(job.id)
+    status = "ok"
+
+    try:
+        await job_store.mark_running(job)
+
+        # The job task copies the context, so it sees the active trace
+        job.task = asyncio.create_task(run_job(client, job))
+        await job.task
+    except (asyncio.CancelledError, JobCancelled):
+        if not job.cancelled:
+            raise
+        status = "cancelled"
+        logger.info(f"Job {job.id} cancelled by user")
+    except StageTimeout as e:
+        status = "timeout"
+        logger.warning(f"Job {job.id} timed out: {e}")
+        try:
+            await job.status_msg.edit_text(f"⏱ **Timed Out!**\n\n`{e}`\nPlease try again later.")
+        except:
+            pass
+    except Exception as e:
+        status = "error"
+        logger.error(f"Queue Error: {e}")
+        try:
+            await job.status_msg.edit_text(f"❌ **Error:**\n`{str(e)}`")
+        except:
+            pass
+    finally:
+        if job.file_path:
+            await remove_file(job.file_path)
+        scheduler.end_flight(job)
+        await settle_followers(job)
+        await job_store.remove(job)
+        await scheduler.done(job)
+        tracer.finish(job.id, status if job.result or status != "ok" else "failed")
+        tracer.deactivate(trace_token)
+
+async def queue_worker(client):
+    """Pull jobs from the fair scheduler until the bot stops"""
+    while True:
+        job = await scheduler.get()
+        await run_queued_job(client, job)
+
+@app.on_callback_query(filters.regex("^cancel_job_"))
+@rate_limited
+async def cancel_job_callback(client: Client, callback: CallbackQuery):
+    job_id = callback.data.split("_", 2)[2]
+    job = scheduler.get_job(job_id)
+
+    if not job:
+        await callback.answer("This job is no longer running.", show_alert=True)
+        return
+
+    if job.user_id != callback.from_user.id and not await is_admin(callback.from_user.id):
+        await callback.answer("🚫 This is not your job!", show_alert=True)
+        return
+
+    was_running = job.id in scheduler.running
+    await scheduler.cancel(job_id)
+    await job_store.remove(job)
+
+    # Running jobs hand over their followers when the worker stops
+    if not was_running:
+        tracer.finish(job.id, "cancelled")
+        await settle_followers(job)
+
+    await callback.answer("Job cancelled!")
+    await callback.message.edit_text(
+        "🛑 **Job Cancelled!**\n\n"
+        "📤 Send another file or URL whenever you're ready."
+    )
+
+async def restore_job(client, record) -> bool:
+    """Re-queue one stored job, False when it should be tried again later"""
+    try:
+        message = await client.get_messages(record["chat_id"], record["message_id"])
+        status_msg = await client.get_messages(record["chat_id"], record["status_msg_id"])
+
+        if not message or message.empty or not status_msg or status_msg.empty:
+            raise ValueError("original messages are gone")
+
+        if record["type"] == "url":
+            source = record["source"]
+        else:
+            source = message.document or message.video or message.audio or message.photo
+            if not source:
+                raise ValueError("the file is gone from the message")
+    except ValueError as e:
+        logger.error(f"Dropping unrecoverable job {record['id']}: {e}")
+        await job_store.discard(record["id"])
+        return True
+    except FloodWait as e:
+        count_floodwait("restore", e.value)
+        logger.warning(f"Could not restore job {record['id']} yet: FloodWait {e.value}s")
+        return False
+    except Exception as e:
+        # Telegram may just be unreachable, the record stays for the next try
+        logger.warning(f"Could not restore job {record['id']} yet: {e}")
+        return False
+
+    job = Job(
+        record["type"], source, message, status_msg, record["user_id"],
+        priority=record["priority"], file_size=record["file_size"]
+    )
+    job.id = record["id"]
+    job.dedup_key = record.get("dedup_key")
+    # Keep the wait from before the restart, the overdue check counts it
+    job.enqueued_at = datetime.fromisoformat(record["queued_at"]).timestamp()
+    job.created_at -= max(time.time() - job.enqueued_at, 0)
+
+    tracer.start(job.id, type=job.type, user_id=job.user_id, resumed=True)
+
+    # Identical jobs restored after their leader attach to it again
+    if scheduler.attach(job):
+        return True
+
+    job.last_position = await scheduler.put(job)
+    was_running = record["state"] == "running"
+
+    try:
+        await status_msg.edit_text(
+            f"♻️ **Job Resumed!**\n\n"
+            f"{'⚠️ The transfer was interrupted by a restart and will start over.' if was_running else '🔄 The bot restarted, your job is still queued.'}\n"
+            f"📋 **Queue Position:** `#{job.last_position}`",
+            reply_markup=get_cancel_keyboard(job)
+        )
+    except Exception as e:
+        logger.error(f"Could not update resumed job {job.id}: {e}")
+    return True
+
+async def restore_jobs(client):
+    """Re-queue jobs that were pending or running when the bot went down"""
+    pending = []
+    for record in job_store.pending():
+        if not await restore_job(client, record):
+            pending.append(record)
+
+    if scheduler.qsize():
+        logger.info(f"Restored {scheduler.qsize()} queued jobs")
+    if pending:
+        asyncio.create_task(retry_restore(client, pending))
+
+async def retry_restore(client, records):
+    """Keep trying to restore jobs Telegram could not give back at startup"""
+    while records:
+        logger.info(f"Retrying {len(records)} jobs to restore in {RESTORE_RETRY_INTERVAL}s")
+        await asyncio.sleep(RESTORE_RETRY_INTERVAL)
+        # Cancelled meanwhile, or finished by an identical job
+        records = [r for r in records if r["id"] in job_store.jobs]
+        records = [r for r in records if not await restore_job(client, r)]
+
+async def queue_position_updater():
+    """Keep queued users' status messages showing their current position"""
+    while True:
+        await asyncio.sleep(QUEUE_REFRESH_INTERVAL)
+
+        # Space may have been freed outside the bot
+        if disk_space.waiting:
+            await scheduler.wake()
+
+        moved = []
+        for job in scheduler.queued_jobs():
+            position = scheduler.position(job)
+            if position and position != job.last_position:
+                moved.append((position, job))
+
+        # Front of the queue first, jobs past the cap catch up next tick
+        moved.sort(key=lambda item: item[0])
+        for position, job in moved[:QUEUE_EDITS_PER_TICK]:
+            name = job.source if job.type == "url" else getattr(job.source, "file_name", "file")
 
-async def process_queue(client):
-    async with processing_lock:
-        while not download_queue.empty():
-            task = await download_queue.get()
-            type_ = task[0]
-            
             try:
-                if type_ == "file":
-                    await process_tg_file(client, *task[1:])
-                elif type_ == "url":
-                    await process_url_file(client, *task[1:])
-            except Exception as e:
-                logger.error(f"Queue Error: {e}")
-                try:
-                    await task[3].edit_text(f"❌ **Error:**\n`{str(e)}`")
-                except:
-                    pass
+                await job.status_msg.edit_text(
+                    get_queue_text(job.type, name, job.file_size, position),
+                    reply_markup=get_cancel_keyboard(job)
+                )
+            except FloodWait as e:
+                # More edits now would only extend the wait, retry next tick
+                count_floodwait("queue_position", e.value)
+                await asyncio.sleep(e.value)
+                break
+            except Exception:
+                pass
+            job.last_position = position
+
+# ================== TRANSFER WORKERS ==================
+
+# With TRANSFER_MODE=broker this process only talks to Telegram users,
+# the transfers themselves run in worker.py processes. In processes mode
+# the bot forks those itself on start and feeds them over IPC queues.
+broker = get_broker() if TRANSFER_MODE == "broker" else None
+transfer_processes = []
+remote_jobs = {}    # job_id -> the job, its future and the worker seen last
+# A worker runs both stages under these limits, the same bound applies here
+REMOTE_JOB_TIMEOUT = DOWNLOAD_TIMEOUT + UPLOAD_TIMEOUT
+dispatched = set()  # tasks of jobs handed to transfer workers
+
+def transfer_process_name(index):
+    return f"{socket.gethostname()}-p{index}"
+
+def start_transfer_process(index):
+    # Only processes mode needs the worker module
+    import worker
+    process = multiprocessing.get_context("spawn").Process(
+        target=worker.run_process,
+        args=(broker.worker_view(index), transfer_process_name(index)),
+        name=f"transfer-{index}",
+        daemon=True
+    )
+    process.start()
+    return process
+
+async def supervise_transfer_processes():
+    """Restart transfer processes that died, their jobs go back to the queue"""
+    while True:
+        await asyncio.sleep(5)
+        for index, process in enumerate(transfer_processes):
+            if process.is_alive():
+                continue
+            logger.error(f"Transfer process {index} exited with code {process.exitcode}, restarting")
+            await broker.unregister(transfer_process_name(index))
+            transfer_processes[index] = start_transfer_process(index)
+
+async def stop_transfer_processes():
+    """Give the transfer processes a moment to hand back their jobs"""
+    for process in transfer_processes:
+        await run_io(process.join, 10)
+        if process.is_alive():
+            process.terminate()
+
+def get_broker_payload(job):
+    """Everything a worker needs to redo the job on its own session"""
+    payload = {"type": job.type, "user_id": job.user_id, "file_size": job.file_size}
+    if job.type == "url":
+        payload["source"] = job.source
+    else:
+        payload["chat_id"] = job.message.chat.id
+        payload["message_id"] = job.message.id
+    return payload
+
+async def remote_slots():
+    """Jobs the live transfer workers can run at once"""
+    return sum(worker["info"].get("slots", 1) for worker in await broker.workers())
+
+async def remote_dispatcher(client):
+    """
+    Take jobs from the fair scheduler while the transfer workers have
+    free slots. Handing a job over costs no dispatcher task, so the
+    workers' capacity and not WORKER_COUNT decides how many run at once
+    """
+    while True:
+        if len(scheduler.running) >= await remote_slots():
+            await asyncio.sleep(BROKER_POLL_INTERVAL)
+            continue
+        job = await scheduler.get()
+        task = asyncio.create_task(run_queued_job(client, job))
+        dispatched.add(task)
+        task.add_done_callback(dispatched.discard)
+
+async def poll_remote_jobs():
+    """One loop polls the broker for every job that is out with a worker"""
+    while True:
+        await asyncio.sleep(BROKER_POLL_INTERVAL)
+        if not remote_jobs:
+            continue
+        try:
+            tasks = await broker.get_many(list(remote_jobs))
+        except Exception as e:
+            logger.error(f"Broker poll failed: {e}")
+            continue
+
+        for job_id, remote in list(remote_jobs.items()):
+            if remote["future"].done():
+                continue
+            task = tasks.get(job_id)
+            if task is None:
+                remote["future"].set_exception(RuntimeError("The job was lost by the broker"))
+            elif task["state"] in ("done", "failed"):
+                remote["future"].set_result(task)
+            elif time.monotonic() > remote["deadline"]:
+                remote["future"].set_exception(
+                    StageTimeout(f"Remote transfer took longer than {REMOTE_JOB_TIMEOUT}s")
+                )
+            else:
+                job = remote["job"]
+                job.touch()
+                if task["state"] == "claimed" and task["worker"] != remote["worker"]:
+                    remote["worker"] = task["worker"]
+                    try:
+                        await job.status_msg.edit_text(
+                            "🚚 **Transferring...**\n\n"
+                            f"📄 **File:** `{remote['name'][:50]}`\n"
+                            f"⚙️ **Worker:** `{task['worker']}`",
+                            reply_markup=get_cancel_keyboard(job)
+                        )
+                    except Exception:
+                        pass
+
+async def wait_for_worker(job, name):
+    """Wait until the poller sees a worker finish the job, returns the task"""
+    future = asyncio.get_running_loop().create_future()
+    remote_jobs[job.id] = {
+        "job": job, "name": name, "future": future, "worker": None,
+        "deadline": time.monotonic() + REMOTE_JOB_TIMEOUT
+    }
+    try:
+        return await future
+    finally:
+        remote_jobs.pop(job.id, None)
+
+async def run_remote_job(client, job):
+    """Hand a job to a transfer worker through the broker and finish it here"""
+    name = job.source if job.type == "url" else getattr(job.source, "file_name", "file")
+
+    with tracer.span("remote_transfer") as span:
+        await broker.submit(job.id, get_broker_payload(job))
+        try:
+            task = await wait_for_worker(job, name)
+        except (asyncio.CancelledError, StageTimeout):
+            # The worker sees this on its next heartbeat and stops
+            await broker.cancel(job.id)
+            raise
+        finally:
+            await broker.remove(job.id)
+        span.set(worker=task["worker"], state=task["state"])
+
+    if task["state"] == "failed":
+        raise RuntimeError(task["error"])
+
+    result = task["result"]
+    job.content_key = result.get("content_key")
+    source = "HTTP URL" if job.type == "url" else "Telegram File"
+    await finish_upload(
+        job.message,
+        result["file_size"], result["file_name"],
+        source, job, result["link"]
+    )
 
 # ================== FAST DOWNLOAD LOGIC ==================
 
-async def process_tg_file(client, media, message, status_msg):
-    file_name = getattr(media, "file_name", f"file_{message.id}_{int(time.time())}")
-    file_path = os.path.join(DOWNLOAD_DIR, file_name)
+async def process_tg_file(client, media, message, status_msg, job):
+    file_name = getattr(media, "file_name", None) or f"file_{message.id}_{int(time.time())}"
+    file_path = get_download_path(job, file_name)
+    job.file_path = file_path
 
     await status_msg.edit_text(
         f"⬇️ **Downloading...**\n\n"
         f"📄 **File:** `{file_name}`\n"
         f"📦 **Size:** `{human_readable_size(media.file_size)}`\n"
-        f"⚡ **Mode:** Native Stream"
+        f"⚡ **Mode:** Native Stream",
+        reply_markup=get_cancel_keyboard(job)
     )
 
-    await client.download_media(message, file_path)
+    started = time.monotonic()
+    with tracer.span("download", source="telegram", size=media.file_size):
+        await run_stage(
+            download_tg_file(client, message, file_path, job),
+            job, "Telegram download", DOWNLOAD_TIMEOUT, DOWNLOAD_IDLE_TIMEOUT
+        )
+    observe_transfer("download", media.file_size, time.monotonic() - started)
 
     await upload_handler(
         client, message, status_msg,
         file_path, media.file_size,
-        file_name, "Telegram File"
+        file_name, "Telegram File", job
     )
 
-async def process_url_file(client, url, message, status_msg):
-    try:
-        file_name = url.split("/")[-1].split("?")[0]
-    except:
-        file_name = "download.bin"
-
-    if not file_name or len(file_name) > 100:
-        file_name = f"url_file_{int(time.time())}.bin"
-        
-    file_path = os.path.join(DOWNLOAD_DIR, file_name)
+async def process_url_file(client, url, message, status_msg, job):
+    file_name = get_url_file_name(url)
+    file_path = get_download_path(job, file_name)
+    job.file_path = file_path
 
     await status_msg.edit_text(
         "⬇️ **Fast Downloading...**\n\n"
         f"🔗 **URL:** `{url[:50]}...`\n"
-        "⏳ **Mode:** Optimized HTTP Stream"
+        "⏳ **Mode:** Optimized HTTP Stream",
+        reply_markup=get_cancel_keyboard(job)
     )
 
-    connector = aiohttp.TCPConnector(limit=None, ttl_dns_cache=300)
-    async with aiohttp.ClientSession(connector=connector) as session:
-        async with session.get(url, timeout=None) as response:
-            if response.status != 200:
-                return await status_msg.edit_text(f"❌ URL Error: {response.status}")
-            
-            with open(file_path, "wb") as f:
-                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
-                    f.write(chunk)
+    started = time.monotonic()
+    with tracer.span("download", source="url") as span:
+        status = await run_stage(
+            download_url(url, file_path, job),
+            job, "URL download", DOWNLOAD_TIMEOUT, DOWNLOAD_IDLE_TIMEOUT
+        )
+        span.set(http_status=status)
+    if status != 200:
+        return await status_msg.edit_text(f"❌ URL Error: {status}")
 
     final_size = os.path.getsize(file_path)
+    observe_transfer("download", final_size, time.monotonic() - started)
     
     await upload_handler(
         client, message, status_msg,
         file_path, final_size,
-        file_name, "HTTP URL"
+        file_name, "HTTP URL", job
     )
 
 # ================== UPLOAD & FINAL LOGGING ==================
 
-async def upload_handler(client, message, status_msg, file_path, file_size, file_name, source):
+def get_complete_text(file_name, file_size, source, link, cached=False):
+    cached_line = "⚡ **Instant:** Already on GoFile\n" if cached else ""
+    return (
+        f"✅ **Upload Complete!**\n\n"
+        f"📄 **File:** `{file_name}`\n"
+        f"📦 **Size:** `{human_readable_size(file_size)}`\n"
+        f"📥 **Source:** {source}\n"
+        f"{cached_line}\n"
+        f"🔗 **Download Link:**\n{link}\n\n"
+        f"🔹**Powered By : @TOOLS_BOTS_KING **🔸"
+    )
+
+def get_complete_keyboard(link):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🔗 Open Link", url=link)],
+        [InlineKeyboardButton("📤 Upload Another", callback_data="go_start")]
+    ])
+
+async def upload_handler(client, message, status_msg, file_path, file_size, file_name, source, job):
     try:
         await status_msg.edit_text(
             "⬆️ **Uploading to GoFile...**\n\n"
             f"📄 **File:** `{file_name}`\n"
             f"📦 **Size:** `{human_readable_size(file_size)}`\n"
-            "🚀 **Optimized Buffer Active**"
+            "🚀 **Optimized Buffer Active**",
+            reply_markup=get_cancel_keyboard(job)
         )
         
-        link = await upload_to_gofile(file_path)
+        # Same content may already be on GoFile from another source
+        cached = await dedup_index.lookup(job.content_key)
+        if cached:
+            link = cached["link"]
+            tracer.annotate_trace(job.id, content_dedup=True)
+        else:
+            started = time.monotonic()
+            with tracer.span("upload", size=file_size):
+                link = await run_stage(
+                    upload_to_gofile(file_path, progress=job.touch, file_name=file_name),
+                    job, "GoFile upload", UPLOAD_TIMEOUT, UPLOAD_IDLE_TIMEOUT
+                )
+            if link:
+                observe_transfer("upload", file_size, time.monotonic() - started)
 
         if not link:
             return await status_msg.edit_text("❌ **Upload Failed.**\nGoFile servers might be busy.")
 
-        # Update user stats
-        await db.update_user_stats(message.from_user.id, file_size)
-
-        # ================== 1. USER RESPONSE ==================
-        user_text = (
-            f"✅ **Upload Complete!**\n\n"
-            f"📄 **File:** `{file_name}`\n"
-            f"📦 **Size:** `{human_readable_size(file_size)}`\n"
-            f"📥 **Source:** {source}\n\n"
-            f"🔗 **Download Link:**\n{link}\n\n"
-            f"🔹**Powered By : @TOOLS_BOTS_KING **🔸"
-        )
-        
-        buttons = [
-            [InlineKeyboardButton("🔗 Open Link", url=link)],
-            [InlineKeyboardButton("📤 Upload Another", callback_data="go_start")]
-        ]
-        
-        await status_msg.edit_text(
-            user_text, 
-            disable_web_page_preview=True,
-            reply_markup=InlineKeyboardMarkup(buttons)
-        )
-
-        # ================== 2. BACKUP CHANNEL FINAL LOG ==================
-        if BACKUP_CHANNEL_ID:
-            user = message.from_user
-            log_text = (
-                f"#UPLOAD_COMPLETE\n\n"
-                f"👤 **User:** {user.first_name} (`{user.id}`)\n"
-                f"📛 **Username:** @{user.username if user.username else 'None'}\n"
-                f"📅 **Date:** {get_current_time()}\n"
-                f"📥 **Source:** {source}\n"
-                f"📄 **File:** `{file_name}`\n"
-                f"📦 **Size:** `{human_readable_size(file_size)}`\n"
-                f"🔗 **GoFile Link:** {link}"
-            )
-            
-            try:
-                await client.send_message(
-                    BACKUP_CHANNEL_ID,
-                    log_text,
-                    disable_web_page_preview=True
-                )
-            except Exception as e:
-                logger.error(f"Failed to send final log to backup: {e}")
+        await finish_upload(message, file_size, file_name, source, job, link)
 
+    except (StageTimeout, JobCancelled):
+        raise
     except Exception as e:
         logger.error(f"Upload Handler Error: {e}")
         await status_msg.edit_text(f"❌ **Critical Error:** {e}")
     finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-# ================== GOFILE UPLOADER ==================
-
-async def upload_to_gofile(path):
-    mime_type, _ = mimetypes.guess_type(path)
-    if mime_type is None:
-        mime_type = "application/octet-stream"
-
-    connector = aiohttp.TCPConnector(limit=None, ttl_dns_cache=300)
+        await remove_file(file_path)
+
+async def finish_upload(message, file_size, file_name, source, job, link, cached=False):
+    """Record a finished upload, answer the user and log it to the backup channel"""
+    job.result = (file_name, file_size, source, link)
+
+    # Update user stats
+    await db.update_user_stats(message.from_user.id, file_size)
+    if not cached:
+        await dedup_index.record(job.dedup_key, link, file_name, file_size)
+        await dedup_index.record(job.content_key, link, file_name, file_size)
+
+    # ================== 1. USER RESPONSE ==================
+    with tracer.span("notify_user"):
+        await retry_floodwait(
+            "notify_user", send_status,
+            message, job,
+            get_complete_text(file_name, file_size, source, link, cached=cached),
+            disable_web_page_preview=True,
+            reply_markup=get_complete_keyboard(link)
+        )
 
-    for server in PRIORITIZED_SERVERS:
-        try:
-            url = f"https://{server}.gofile.io/uploadfile"
-            
-            async with aiohttp.ClientSession(connector=connector) as session:
-                with open(path, "rb") as f:
-                    data = aiohttp.FormData()
-                    data.add_field('file', f, filename=os.path.basename(path), content_type=mime_type)
-                    data.add_field('token', GOFILE_API_TOKEN)
-                    
-                    if GOFILE_FOLDER_ID:
-                        data.add_field('folderId', GOFILE_FOLDER_ID)
-
-                    async with session.post(url, data=data) as response:
-                        if response.status == 200:
-                            result = await response.json()
-                            if result.get("status") == "ok":
-                                return result["data"]["downloadPage"]
-        except Exception as e:
-            logger.error(f"Server {server} failed: {e}")
-            continue
-            
-    return None
+    # ================== 2. BACKUP CHANNEL FINAL LOG ==================
+    if BACKUP_CHANNEL_ID:
+        user = message.from_user
+        log_text = (
+            f"#UPLOAD_COMPLETE\n\n"
+            f"👤 **User:** {user.first_name} (`{user.id}`)\n"
+            f"📛 **Username:** @{user.username if user.username else 'None'}\n"
+            f"📅 **Date:** {get_current_time()}\n"
+            f"📥 **Source:** {source}\n"
+            f"📄 **File:** `{file_name}`\n"
+            f"📦 **Size:** `{human_readable_size(file_size)}`\n"
+            f"🔗 **GoFile Link:** {link}"
+        )
+        if cached:
+            log_text += "\n⚡ **Cached:** Already on GoFile"
+        backup_digest.post(
+            {
+                "type": "upload_complete",
+                "time": get_current_time(),
+                "user_id": user.id,
+                "first_name": user.first_name,
+                "username": user.username,
+                "source": source,
+                "file_name": file_name,
+                "size": file_size,
+                "link": link,
+                "cached": cached
+            },
+            log_text,
+            trace_id=job.id
+        )
 
 # ================== WEB SERVER (RENDER KEEP-ALIVE) ==================
 
@@ -1221,9 +1904,24 @@ async def web_handler(request):
         content_type="text/plain"
     )
 
+async def metrics_handler(request):
+    return web.Response(
+        body=registry.render().encode(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+    )
+
+async def loop_handler(request):
+    return web.json_response(loop_monitor.snapshot())
+
+async def workers_handler(request):
+    return web.json_response(await broker.workers() if broker else [])
+
 async def start_web():
     appw = web.Application()
     appw.router.add_get("/", web_handler)
+    appw.router.add_get("/metrics", metrics_handler)
+    appw.router.add_get("/loop", loop_handler)
+    appw.router.add_get("/workers", workers_handler)
     runner = web.AppRunner(appw)
     await runner.setup()
     await web.TCPSite(
@@ -1234,13 +1932,59 @@ async def start_web():
 # ================== MAIN EXECUTION ==================
 
 async def main():
+    global broker
     print("🤖 Bot Starting with uvloop optimization...")
+    # Read the database while connecting, handlers wait for it
+    asyncio.create_task(db.load())
+    if TRANSFER_MODE == "processes":
+        broker = IPCBroker(TRANSFER_PROCESSES)
     await app.start()
     print("✅ Bot Connected to Telegram")
     print("🌍 Starting Web Server...")
     await start_web()
+
+    # Workers own their disks in broker mode, otherwise transfers land here
+    if TRANSFER_MODE != "broker":
+        # Nothing is running yet, whatever is left in the download dir is orphaned
+        count, freed = await run_io(disk_space.sweep)
+        if count:
+            logger.info(f"Removed {count} orphaned downloads ({human_readable_size(freed)})")
+        scheduler.admission = disk_space
+
+    await restore_jobs(app)
+
+    if TRANSFER_MODE == "processes":
+        transfer_processes.extend(start_transfer_process(i) for i in range(TRANSFER_PROCESSES))
+        asyncio.create_task(supervise_transfer_processes())
+        print(f"🚚 Forked {TRANSFER_PROCESSES} transfer processes")
+
+    if broker:
+        asyncio.create_task(remote_dispatcher(app))
+        asyncio.create_task(poll_remote_jobs())
+    else:
+        for _ in range(WORKER_COUNT):
+            asyncio.create_task(queue_worker(app))
+    asyncio.create_task(queue_position_updater())
+    asyncio.create_task(loop_monitor.run())
+    asyncio.create_task(backup_sender.run(app))
+    asyncio.create_task(backup_digest.run())
+
     print("🚀 High Speed Pipeline Ready. Waiting for requests.")
+    # The load may still be running in its thread
+    await db.loaded.wait()
+    logger.info(
+        f"Started in {time.monotonic() - STARTED_AT:.2f}s "
+        f"(imports {IMPORT_SECONDS:.2f}s, database {db.load_seconds:.2f}s)"
+    )
     await idle()
+
+    # Don't lose the entries of a half-full digest on shutdown
+    backup_digest.flush()
+    try:
+        await asyncio.wait_for(backup_sender.queue.join(), timeout=10)
+    except asyncio.TimeoutError:
+        logger.error("Backup queue was not empty at shutdown")
+    await stop_transfer_processes()
     await app.stop()
 
 if __name__ == "__main__":
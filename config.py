@@ -30,7 +30,62 @@ OWNER_ID = int(os.environ.get("OWNER_ID", ADMIN_IDS[0] if ADMIN_IDS else 0))
 
 # LIMITS
 MAX_FILE_SIZE = 50 * 1024 * 1024 * 1024  # 50GB
-CHUNK_SIZE = 4 * 1024 * 1024  # 4MB
+CHUNK_SIZE = 4 * 1024 * 1024  # 4MB, starting point for adaptive chunk sizing
+CHUNK_SIZE_MIN = int(os.environ.get("CHUNK_SIZE_MIN", 256 * 1024))  # Never go below 256KB
+CHUNK_SIZE_MAX = int(os.environ.get("CHUNK_SIZE_MAX", 16 * 1024 * 1024))  # Never go above 16MB
+CHUNK_TARGET_SECONDS = float(os.environ.get("CHUNK_TARGET_SECONDS", 0.25))  # Aim for one chunk per this many seconds
+CHUNK_MEMORY_FRACTION = float(os.environ.get("CHUNK_MEMORY_FRACTION", 0.1))  # Share of free memory all transfer buffers may use
+TG_DOWNLOAD_STREAMS = int(os.environ.get("TG_DOWNLOAD_STREAMS", 4))  # Concurrent part streams per Telegram download
+TG_SEGMENT_CHUNKS = int(os.environ.get("TG_SEGMENT_CHUNKS", 4))  # Smallest range in MiB worth its own stream
+FILE_IO_THREADS = int(os.environ.get("FILE_IO_THREADS", 8))  # Threads doing disk reads/writes off the event loop
+
+# FLOOD SHIELD
+USER_RATE_LIMIT = float(os.environ.get("USER_RATE_LIMIT", 0.5))  # Updates per second
+USER_RATE_BURST = int(os.environ.get("USER_RATE_BURST", 5))
+GLOBAL_RATE_LIMIT = float(os.environ.get("GLOBAL_RATE_LIMIT", 30))
+GLOBAL_RATE_BURST = int(os.environ.get("GLOBAL_RATE_BURST", 60))
+FLOOD_STRIKE_LIMIT = int(os.environ.get("FLOOD_STRIKE_LIMIT", 10))  # Dropped updates before auto-ban
+FLOOD_STRIKE_WINDOW = int(os.environ.get("FLOOD_STRIKE_WINDOW", 60))  # Seconds a dropped update counts as a strike
+FLOOD_BAN_SECONDS = int(os.environ.get("FLOOD_BAN_SECONDS", 60))  # Doubles on every repeat ban
+FLOOD_MAX_BAN_SECONDS = int(os.environ.get("FLOOD_MAX_BAN_SECONDS", 3600))
+
+# BACKUP SENDER
+BACKUP_RATE_LIMIT = float(os.environ.get("BACKUP_RATE_LIMIT", 0.3))  # Posts per second, channels allow ~20 per minute
+BACKUP_RATE_BURST = int(os.environ.get("BACKUP_RATE_BURST", 5))
+BACKUP_MAX_RETRIES = int(os.environ.get("BACKUP_MAX_RETRIES", 5))
+BACKUP_QUEUE_SIZE = int(os.environ.get("BACKUP_QUEUE_SIZE", 10000))  # Posts beyond this are dropped
+BACKUP_LOG_MODE = os.environ.get("BACKUP_LOG_MODE", "each")  # each, digest (combined messages) or document (JSONL/CSV file)
+BACKUP_COPY_FILES = os.environ.get("BACKUP_COPY_FILES", "true").lower() == "true"  # Keep copying every incoming file
+DIGEST_INTERVAL = int(os.environ.get("DIGEST_INTERVAL", 300))  # Seconds between digests
+DIGEST_MAX_ENTRIES = int(os.environ.get("DIGEST_MAX_ENTRIES", 20))  # Send early once this many entries wait
+DIGEST_FORMAT = os.environ.get("DIGEST_FORMAT", "jsonl")  # jsonl or csv for document mode
+
+# QUEUE
+WORKER_COUNT = int(os.environ.get("WORKER_COUNT", 3))  # Concurrent transfers
+PER_USER_MAX_INFLIGHT = int(os.environ.get("PER_USER_MAX_INFLIGHT", 1))
+QUEUE_REFRESH_INTERVAL = int(os.environ.get("QUEUE_REFRESH_INTERVAL", 15))  # Seconds between position updates
+QUEUE_EDITS_PER_TICK = int(os.environ.get("QUEUE_EDITS_PER_TICK", 20))  # Position edits per update, the rest wait a tick
+RESTORE_RETRY_INTERVAL = int(os.environ.get("RESTORE_RETRY_INTERVAL", 60))  # Seconds between tries to restore a job after a restart
+SMALL_FILE_LIMIT = int(os.environ.get("SMALL_FILE_LIMIT", 100 * 1024 * 1024))  # 100MB, small lane below this
+LARGE_FILE_LIMIT = int(os.environ.get("LARGE_FILE_LIMIT", 2 * 1024 * 1024 * 1024))  # 2GB, large lane from this
+URL_PROBE_TIMEOUT = int(os.environ.get("URL_PROBE_TIMEOUT", 5))  # HEAD request used to size URL jobs
+LANE_MAX_WAIT = int(os.environ.get("LANE_MAX_WAIT", 600))  # Seconds before a big job jumps the small lanes
+
+# TRANSFER WORKERS
+TRANSFER_MODE = os.environ.get("TRANSFER_MODE", "local")  # local, broker to hand jobs to worker.py processes, or processes to fork them here
+TRANSFER_PROCESSES = int(os.environ.get("TRANSFER_PROCESSES", 2))  # Worker processes the bot forks in processes mode
+BROKER_BACKEND = os.environ.get("BROKER_BACKEND", "sqlite")
+BROKER_PATH = os.environ.get("BROKER_PATH", "broker.db")  # SQLite broker file, shared by dispatcher and workers
+BROKER_LEASE = int(os.environ.get("BROKER_LEASE", 60))  # Seconds a claimed job survives without a worker heartbeat
+BROKER_POLL_INTERVAL = float(os.environ.get("BROKER_POLL_INTERVAL", 2))
+WORKER_ID = os.environ.get("WORKER_ID", "")  # Defaults to hostname-pid
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", 2))  # Jobs one worker process runs at once
+
+# TIMEOUTS (seconds)
+DOWNLOAD_IDLE_TIMEOUT = int(os.environ.get("DOWNLOAD_IDLE_TIMEOUT", 120))  # No bytes received
+DOWNLOAD_TIMEOUT = int(os.environ.get("DOWNLOAD_TIMEOUT", 6 * 3600))
+UPLOAD_IDLE_TIMEOUT = int(os.environ.get("UPLOAD_IDLE_TIMEOUT", 120))  # No bytes sent
+UPLOAD_TIMEOUT = int(os.environ.get("UPLOAD_TIMEOUT", 6 * 3600))
 
 # GoFile Servers
 PRIORITIZED_SERVERS = [
@@ -38,9 +93,29 @@ PRIORITIZED_SERVERS = [
     "upload-ap-tyo", "upload-sa-sao", "upload-eu-fra"
 ]
 
+GOFILE_UPLOAD_URL = os.environ.get("GOFILE_UPLOAD_URL", "https://{server}.gofile.io/uploadfile")  # {server} is filled in from the list above
+
 HEADERS = {"Authorization": f"Bearer {GOFILE_API_TOKEN}"}
 DOWNLOAD_DIR = "downloads"
 DATABASE_FILE = "database.json"
+JOBS_FILE = "jobs.json"
+DEDUP_FILE = "dedup.json"
+DB_FORMAT = os.environ.get("DB_FORMAT", "json")  # json (orjson when installed) or msgpack, existing files are read in any format
+DB_COMPRESSION = os.environ.get("DB_COMPRESSION", "none")  # none or zstd
+
+# DISK SPACE (bytes)
+DISK_FREE_MARGIN = int(os.environ.get("DISK_FREE_MARGIN", 512 * 1024 * 1024))  # Always keep this much free in DOWNLOAD_DIR
+DISK_UNKNOWN_SIZE_RESERVE = int(os.environ.get("DISK_UNKNOWN_SIZE_RESERVE", 1024 * 1024 * 1024))  # Reserved for jobs of unknown size
+
+# DEDUP CACHE (seconds)
+DEDUP_TTL = int(os.environ.get("DEDUP_TTL", 7 * 24 * 3600))
+DEDUP_REVALIDATE_AFTER = int(os.environ.get("DEDUP_REVALIDATE_AFTER", 3600))  # Re-check link liveness after this
+HASH_ALGORITHM = os.environ.get("HASH_ALGORITHM", "auto")  # auto, xxh3, blake2b or off
+
+# TRACING
+TRACE_BUFFER_SIZE = int(os.environ.get("TRACE_BUFFER_SIZE", 1000))  # Finished job traces kept in memory
+LOOP_MONITOR_INTERVAL = float(os.environ.get("LOOP_MONITOR_INTERVAL", 0.25))  # Heartbeat / lag sample period
+SLOW_CALLBACK_THRESHOLD = float(os.environ.get("SLOW_CALLBACK_THRESHOLD", 0.5))  # Blocking longer than this is logged
 
 # Bot Info
 BOT_USERNAME = os.environ.get("BOT_USERNAME", "YourBot")
@@ -1,15 +1,49 @@
 #!/usr/bin/env python3
-import json
 import os
+import time
+import shutil
 import asyncio
+import threading
+import logging
 from datetime import datetime
 from config import DATABASE_FILE
+from serializers import Codec
+
+logger = logging.getLogger(__name__)
 
 class Database:
     def __init__(self):
         self.db_file = DATABASE_FILE
         self.lock = asyncio.Lock()
-        self.data = self._load_db()
+        self.on_save = None  # Called with the save duration in seconds
+        self.codec = Codec()
+        self.upgrade_from = None  # Format of a file written before DB_FORMAT changed
+        self.loaded = asyncio.Event()
+        self.load_seconds = 0.0
+        self.load_lock = threading.Lock()  # load() and the lazy property may race
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            # Needed before the background load finished, read it now
+            self._load_once()
+            self.loaded.set()
+        return self._data
+
+    def _load_once(self):
+        """Read the file unless another caller already has"""
+        with self.load_lock:
+            if self._data is None:
+                start = time.perf_counter()
+                self._data = self._load_db()
+                self.load_seconds = time.perf_counter() - start
+
+    async def load(self):
+        """Read the database file in a thread, callers wait on `loaded`"""
+        if self._data is None:
+            await asyncio.to_thread(self._load_once)
+        self.loaded.set()
     
     def _load_db(self):
         """Load database from file"""
@@ -37,22 +71,46 @@ class Database:
         
         if os.path.exists(self.db_file):
             try:
-                with open(self.db_file, 'r') as f:
-                    loaded = json.load(f)
-                    # Merge with defaults to handle missing keys
-                    for key in default_data:
-                        if key not in loaded:
-                            loaded[key] = default_data[key]
-                    return loaded
-            except:
+                with open(self.db_file, 'rb') as f:
+                    raw = f.read()
+                loaded, found = self.codec.read(raw)
+                # The next save rewrites the file in the configured format
+                if found != self.codec.name:
+                    logger.info(f"Database is stored as {found}, upgrading to {self.codec.name} on next save")
+                    self.upgrade_from = found
+                # Merge with defaults to handle missing keys
+                for key in default_data:
+                    if key not in loaded:
+                        loaded[key] = default_data[key]
+                return loaded
+            except Exception as e:
+                # Starting empty would overwrite the real data on the next save,
+                # keep the file for a manual fix (e.g. installing msgpack)
+                broken = f"{self.db_file}.unreadable-{int(time.time())}"
+                os.replace(self.db_file, broken)
+                logger.error(f"Could not read {self.db_file} ({e}), moved it to {broken} and started empty")
                 return default_data
         return default_data
     
     async def _save_db(self):
         """Save database to file"""
         async with self.lock:
-            with open(self.db_file, 'w') as f:
-                json.dump(self.data, f, indent=2, default=str)
+            start = time.perf_counter()
+            # Serialize on the loop for a consistent snapshot, write in a thread
+            data = self.codec.dumps(self.data)
+            await asyncio.to_thread(self._write_file, data)
+            if self.on_save:
+                self.on_save(time.perf_counter() - start)
+    
+    def _write_file(self, data: bytes):
+        if self.upgrade_from:
+            # Keep the old file around in case the bot is rolled back
+            shutil.copy2(self.db_file, f"{self.db_file}.{self.upgrade_from}.bak")
+            self.upgrade_from = None
+        tmp_path = f"{self.db_file}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self.db_file)
     
     # ================== USER MANAGEMENT ==================
     
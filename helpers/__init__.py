@@ -1,3 +1,4 @@
 from .force_sub import check_force_sub, get_invite_links
 from .broadcast import broadcast_message
-from .decorators import admin_only, owner_only, not_banned
\ No newline at end of file
+from .decorators import admin_only, owner_only, not_banned, rate_limited
+from .rate_limit import flood_shield
\ No newline at end of file
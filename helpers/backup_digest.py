@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+import io
+import csv
+import json
+import asyncio
+import logging
+from datetime import datetime
+from config import (
+    BACKUP_CHANNEL_ID,
+    BACKUP_LOG_MODE,
+    DIGEST_INTERVAL,
+    DIGEST_MAX_ENTRIES,
+    DIGEST_FORMAT
+)
+from helpers.backup_sender import backup_sender
+
+logger = logging.getLogger(__name__)
+
+# Telegram's limit for one text message
+MAX_MESSAGE_LENGTH = 4096
+CSV_FIELDS = ("type", "time", "user_id", "first_name", "username", "source", "file_name", "size", "link")
+
+class BackupDigest:
+    """
+    Routes backup channel log entries.
+    In `each` mode every entry is its own post, as before. `digest` mode
+    batches the formatted entries into combined messages and `document`
+    mode sends them as a JSONL or CSV file, either way once every
+    `interval` seconds or as soon as `max_entries` are waiting.
+    """
+
+    def __init__(self, chat_id=BACKUP_CHANNEL_ID, mode: str = BACKUP_LOG_MODE,
+                 interval: int = DIGEST_INTERVAL, max_entries: int = DIGEST_MAX_ENTRIES,
+                 file_format: str = DIGEST_FORMAT):
+        self.chat_id = chat_id
+        self.mode = mode
+        self.interval = interval
+        self.max_entries = max_entries
+        self.file_format = file_format
+        self.entries = []  # (entry, text)
+        self.full = asyncio.Event()
+
+    @property
+    def batching(self) -> bool:
+        return self.mode in ("digest", "document")
+
+    def post(self, entry: dict, text: str, stage: str = "notify", trace_id: str = None):
+        """Log one entry, sent now or with the next digest depending on the mode"""
+        if not self.chat_id:
+            return
+        if not self.batching:
+            backup_sender.send_message(
+                self.chat_id, text, stage=stage, trace_id=trace_id, disable_web_page_preview=True
+            )
+            return
+
+        self.entries.append((entry, text))
+        if len(self.entries) >= self.max_entries:
+            self.full.set()
+
+    def flush(self):
+        """Queue everything buffered so far as digest posts"""
+        entries, self.entries = self.entries, []
+        self.full.clear()
+        if not entries:
+            return
+
+        if self.mode == "document":
+            self._send_document([entry for entry, _ in entries])
+        else:
+            self._send_messages([text for _, text in entries])
+
+    def _send_messages(self, texts: list):
+        header = f"#DIGEST ({len(texts)} entries)\n\n"
+        separator = "\n\n➖➖➖➖➖\n\n"
+        message = header
+        for text in texts:
+            text = text[:MAX_MESSAGE_LENGTH - len(header)]
+            if message != header and len(message) + len(separator) + len(text) > MAX_MESSAGE_LENGTH:
+                backup_sender.send_message(self.chat_id, message, disable_web_page_preview=True)
+                message = header
+            message += (separator if message != header else "") + text
+        backup_sender.send_message(self.chat_id, message, disable_web_page_preview=True)
+
+    def _send_document(self, entries: list):
+        if self.file_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(entries)
+            data = buffer.getvalue()
+        else:
+            data = "".join(json.dumps(entry, default=str) + "\n" for entry in entries)
+
+        document = io.BytesIO(data.encode())
+        document.name = f"backup_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{self.file_format}"
+        backup_sender.send_document(
+            self.chat_id, document,
+            caption=f"#DIGEST\n📋 {len(entries)} log entries"
+        )
+
+    async def run(self):
+        """Flush on every interval, or early when the buffer fills up"""
+        if not self.batching:
+            return
+        while True:
+            try:
+                await asyncio.wait_for(self.full.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Backup digest flush failed: {e}")
+
+# Global backup digest instance
+backup_digest = BackupDigest()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+import io
+import time
+import asyncio
+import logging
+from pyrogram.errors import FloodWait
+from config import (
+    BACKUP_RATE_LIMIT,
+    BACKUP_RATE_BURST,
+    BACKUP_MAX_RETRIES,
+    BACKUP_QUEUE_SIZE
+)
+from helpers.rate_limit import TokenBucket
+from helpers.metrics import STAGE_SECONDS, count_floodwait
+from helpers.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# First retry delay in seconds, doubled on every further attempt
+RETRY_BASE_DELAY = 2
+
+class BackupPost:
+    """One queued post for a backup or log channel"""
+    __slots__ = ("method", "kwargs", "stage", "attempts", "trace_id", "queued_at")
+
+    def __init__(self, method: str, stage: str, trace_id: str = None, **kwargs):
+        self.method = method
+        self.stage = stage
+        self.kwargs = kwargs
+        self.attempts = 0
+        # The job the post belongs to, its trace gets a span once the post is out
+        self.trace_id = trace_id
+        self.queued_at = time.time()
+
+class BackupSender:
+    """
+    Sends backup channel posts in the background.
+    Handlers only queue a post and move on; a single sender task drains
+    the queue at the channel's rate limit, sleeps through FloodWaits and
+    retries failed posts with exponential backoff.
+    """
+
+    def __init__(self, rate: float = BACKUP_RATE_LIMIT, burst: int = BACKUP_RATE_BURST,
+                 max_retries: int = BACKUP_MAX_RETRIES, maxsize: int = BACKUP_QUEUE_SIZE):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.queue = asyncio.Queue(maxsize)
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def _put(self, post: BackupPost) -> bool:
+        try:
+            self.queue.put_nowait(post)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.error(f"Backup queue is full, dropped a {post.stage} post")
+            return False
+
+    def send_message(self, chat_id, text: str, stage: str = "notify", trace_id: str = None, **kwargs) -> bool:
+        """Queue a text post"""
+        return self._put(BackupPost("send_message", stage, trace_id, chat_id=chat_id, text=text, **kwargs))
+
+    def copy_message(self, chat_id, from_chat_id, message_id: int, stage: str = "backup",
+                     trace_id: str = None, **kwargs) -> bool:
+        """Queue a copy of a user's message"""
+        return self._put(BackupPost(
+            "copy_message", stage, trace_id,
+            chat_id=chat_id, from_chat_id=from_chat_id, message_id=message_id, **kwargs
+        ))
+
+    def send_document(self, chat_id, document: io.BytesIO, stage: str = "notify", trace_id: str = None, **kwargs) -> bool:
+        """Queue an in-memory file post"""
+        return self._put(BackupPost("send_document", stage, trace_id, chat_id=chat_id, document=document, **kwargs))
+
+    def _record_span(self, post: BackupPost, error: str = None):
+        """Span from queueing to the post going out, on the job's trace"""
+        trace = tracer.get(post.trace_id) if post.trace_id else None
+        if trace:
+            span = trace.add_span(post.stage, post.queued_at, method=post.method, attempts=post.attempts)
+            span.error = error
+
+    async def _wait_for_token(self):
+        while not self.bucket.take():
+            await asyncio.sleep(1 / self.bucket.rate)
+
+    async def _send(self, client, post: BackupPost):
+        while True:
+            await self._wait_for_token()
+            post.attempts += 1
+            for value in post.kwargs.values():
+                # A retried upload has to start from the top of the file again
+                if isinstance(value, io.IOBase):
+                    value.seek(0)
+            try:
+                with STAGE_SECONDS.labels(post.stage).time():
+                    await getattr(client, post.method)(**post.kwargs)
+                self.sent += 1
+                self._record_span(post)
+                return
+            except FloodWait as e:
+                # Telegram told us exactly how long to back off, that's not a failure
+                count_floodwait(post.stage, e.value)
+                post.attempts -= 1
+                await asyncio.sleep(e.value)
+            except Exception as e:
+                if post.attempts > self.max_retries:
+                    self.failed += 1
+                    logger.error(f"Giving up on {post.stage} post after {post.attempts} attempts: {e}")
+                    self._record_span(post, f"{type(e).__name__}: {e}")
+                    return
+                delay = RETRY_BASE_DELAY * 2 ** (post.attempts - 1)
+                logger.warning(f"{post.stage} post failed ({e}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def run(self, client):
+        """Sender task, drains the queue until the bot stops"""
+        while True:
+            post = await self.queue.get()
+            try:
+                await self._send(client, post)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Backup sender error: {e}")
+            finally:
+                self.queue.task_done()
+
+# Global backup sender instance
+backup_sender = BackupSender()
@@ -4,6 +4,7 @@ import logging
 from pyrogram import Client
 from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked, PeerIdInvalid
 from database import db
+from helpers.metrics import count_floodwait
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -76,6 +77,7 @@ async def broadcast_message(
                 stats.success += 1
                 
             except FloodWait as e:
+                count_floodwait("broadcast", e.value)
                 await asyncio.sleep(e.value)
                 try:
                     if forward:
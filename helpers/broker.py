@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+import json
+import time
+import queue
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from config import BROKER_BACKEND, BROKER_PATH, BROKER_LEASE
+from helpers.file_io import run_io
+
+logger = logging.getLogger(__name__)
+
+class Broker:
+    """
+    Job hand-off between the Telegram-facing dispatcher and transfer workers.
+    The dispatcher submits tasks and polls them, workers claim a task under
+    a lease and keep it alive with heartbeats; a task whose lease runs out
+    (its worker died or left) goes back to the next worker that asks.
+    Backends implement the blocking `_` methods, the async API runs them
+    on the file I/O pool.
+    """
+
+    def __init__(self, lease: int = BROKER_LEASE):
+        self.lease = lease
+
+    # ================== DISPATCHER SIDE ==================
+
+    async def submit(self, task_id: str, payload: dict):
+        await run_io(self._submit, task_id, payload)
+
+    async def get(self, task_id: str):
+        """State of a task: dict with state, worker, progress, result and error"""
+        return await run_io(self._get, task_id)
+
+    async def get_many(self, task_ids: list) -> dict:
+        """States of several tasks in one round trip, task_id -> dict or None"""
+        return await run_io(self._get_many, task_ids)
+
+    async def cancel(self, task_id: str):
+        await run_io(self._cancel, task_id)
+
+    async def remove(self, task_id: str):
+        await run_io(self._remove, task_id)
+
+    async def workers(self, max_age: float = None) -> list:
+        """Workers seen within `max_age` seconds, one lease by default"""
+        return await run_io(self._workers, self.lease if max_age is None else max_age)
+
+    # ================== WORKER SIDE ==================
+
+    async def register(self, worker_id: str, info: dict = None):
+        await run_io(self._register, worker_id, info or {})
+
+    async def unregister(self, worker_id: str):
+        await run_io(self._unregister, worker_id)
+
+    async def claim(self, worker_id: str):
+        """Take the oldest available task, returns (task_id, payload) or None"""
+        return await run_io(self._claim, worker_id)
+
+    async def heartbeat(self, worker_id: str, task_id: str, progress: int = 0) -> str:
+        """Extend the lease, returns the task state so workers notice cancellation"""
+        return await run_io(self._heartbeat, worker_id, task_id, progress)
+
+    async def complete(self, worker_id: str, task_id: str, result: dict):
+        await run_io(self._finish, worker_id, task_id, "done", result, None)
+
+    async def fail(self, worker_id: str, task_id: str, error: str):
+        await run_io(self._finish, worker_id, task_id, "failed", None, error)
+
+    def _get_many(self, task_ids):
+        return {task_id: self._get(task_id) for task_id in task_ids}
+
+class SQLiteBroker(Broker):
+    """Broker in a local SQLite file, for dispatcher and workers sharing a disk"""
+
+    def __init__(self, path: str = BROKER_PATH, lease: int = BROKER_LEASE):
+        super().__init__(lease)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER DEFAULT 0,
+                progress INTEGER DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, created);
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY,
+                info TEXT,
+                last_seen REAL NOT NULL
+            );
+        """)
+
+    def _submit(self, task_id, payload):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO tasks (id, payload, state, created, updated) VALUES (?, ?, 'queued', ?, ?)",
+                (task_id, json.dumps(payload), now, now)
+            )
+
+    def _get(self, task_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT state, worker, progress, result, error FROM tasks WHERE id = ?", (task_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "state": row["state"],
+            "worker": row["worker"],
+            "progress": row["progress"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"]
+        }
+
+    def _cancel(self, task_id):
+        with self.lock:
+            # Unclaimed tasks just go, running ones are flagged for their worker
+            self.conn.execute("DELETE FROM tasks WHERE id = ? AND state = 'queued'", (task_id,))
+            self.conn.execute(
+                "UPDATE tasks SET state = 'cancelled', updated = ? WHERE id = ? AND state = 'claimed'",
+                (time.time(), task_id)
+            )
+
+    def _remove(self, task_id):
+        with self.lock:
+            self.conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def _workers(self, max_age):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, info, last_seen FROM workers WHERE last_seen > ?", (time.time() - max_age,)
+            ).fetchall()
+        return [{"id": r["id"], "info": json.loads(r["info"] or "{}"), "last_seen": r["last_seen"]} for r in rows]
+
+    def _register(self, worker_id, info):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO workers (id, info, last_seen) VALUES (?, ?, ?)",
+                (worker_id, json.dumps(info), time.time())
+            )
+
+    def _unregister(self, worker_id):
+        with self.lock:
+            self.conn.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+            # Hand our tasks straight back instead of waiting for the leases
+            self.conn.execute(
+                "UPDATE tasks SET state = 'queued', worker = NULL, lease_until = NULL "
+                "WHERE worker = ? AND state = 'claimed'", (worker_id,)
+            )
+
+    def _claim(self, worker_id):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("UPDATE workers SET last_seen = ? WHERE id = ?", (now, worker_id))
+                # Cancelled tasks whose worker died never get cleaned up otherwise
+                self.conn.execute("DELETE FROM tasks WHERE state = 'cancelled' AND lease_until < ?", (now,))
+                row = self.conn.execute(
+                    "SELECT id, payload, worker FROM tasks "
+                    "WHERE state = 'queued' OR (state = 'claimed' AND lease_until < ?) "
+                    "ORDER BY created LIMIT 1", (now,)
+                ).fetchone()
+                if row:
+                    self.conn.execute(
+                        "UPDATE tasks SET state = 'claimed', worker = ?, lease_until = ?, "
+                        "attempts = attempts + 1, progress = 0, updated = ? WHERE id = ?",
+                        (worker_id, now + self.lease, now, row["id"])
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        if not row:
+            return None
+        if row["worker"]:
+            logger.warning(f"Task {row['id']} lease of {row['worker']} expired, reclaimed by {worker_id}")
+        return row["id"], json.loads(row["payload"])
+
+    def _heartbeat(self, worker_id, task_id, progress):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("UPDATE workers SET last_seen = ? WHERE id = ?", (now, worker_id))
+            self.conn.execute(
+                "UPDATE tasks SET lease_until = ?, progress = ?, updated = ? "
+                "WHERE id = ? AND worker = ? AND state = 'claimed'",
+                (now + self.lease, progress, now, task_id, worker_id)
+            )
+            row = self.conn.execute(
+                "SELECT state, worker FROM tasks WHERE id = ?", (task_id,)
+            ).fetchone()
+        if not row:
+            return "cancelled"
+        # Lost the lease to another worker, treat it like a cancellation
+        if row["worker"] != worker_id:
+            return "cancelled"
+        return row["state"]
+
+    def _finish(self, worker_id, task_id, state, result, error):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE tasks SET state = ?, result = ?, error = ?, lease_until = NULL, updated = ? "
+                "WHERE id = ? AND worker = ? AND state = 'claimed'",
+                (state, json.dumps(result) if result else None, error, time.time(), task_id, worker_id)
+            )
+            # A cancelled task nobody waits for anymore is cleaned up by its worker
+            self.conn.execute(
+                "DELETE FROM tasks WHERE id = ? AND worker = ? AND state = 'cancelled'", (task_id, worker_id)
+            )
+
+class IPCBroker(Broker):
+    """
+    Broker over multiprocessing queues, for worker processes forked by the bot.
+    Tasks go out on one shared queue, workers report on an event queue
+    that the dispatcher drains whenever it looks at a task, and every
+    worker process has a control queue that carries cancellations.
+    Lease and hand-back behave like the SQLite broker. Workers forget a
+    cancellation after one lease; should a cancelled task be claimed
+    after that, the dispatcher sends the claiming worker a fresh one.
+    """
+
+    def __init__(self, processes: int, lease: int = BROKER_LEASE, context=None):
+        super().__init__(lease)
+        context = context or multiprocessing.get_context("spawn")
+        self.tasks = context.Queue()
+        self.events = context.Queue()
+        self.controls = [context.Queue() for _ in range(processes)]
+        self.index = None
+        self._init_local()
+
+    def _init_local(self):
+        # Process-local state, never pickled across to the workers
+        self.lock = threading.Lock()
+        self.state = {}     # dispatcher: task_id -> task dict
+        self.payloads = {}  # dispatcher: task_id -> payload, for hand-back
+        self.seen = {}      # dispatcher: worker_id -> (info, last_seen)
+        self.cancelled = {}  # worker: cancelled task_id -> time it arrived
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k in ("lease", "tasks", "events", "controls", "index")}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_local()
+
+    def worker_view(self, index: int) -> "IPCBroker":
+        """Copy of the broker for worker process `index`"""
+        view = IPCBroker.__new__(IPCBroker)
+        view.__setstate__({**self.__getstate__(), "index": index})
+        return view
+
+    # ================== DISPATCHER SIDE ==================
+
+    def _drain(self):
+        now = time.time()
+        while True:
+            try:
+                event, task_id, worker_id, data = self.events.get_nowait()
+            except queue.Empty:
+                break
+
+            if event == "register":
+                self.seen[worker_id] = (data, now)
+            elif event == "unregister":
+                self.seen.pop(worker_id, None)
+                self._requeue(lambda task: task["worker"] == worker_id)
+            else:
+                info = self.seen.get(worker_id, ({}, now))[0]
+                self.seen[worker_id] = (info, now)
+
+            task = self.state.get(task_id)
+            if event == "claimed" and (not task or task["state"] == "cancelled"):
+                # Claimed after the worker forgot the cancellation, repeat it
+                self.controls[data].put(task_id)
+                continue
+            if not task:
+                continue
+            if event == "claimed" and task["state"] == "queued":
+                task.update(state="claimed", worker=worker_id, progress=0)
+            elif event == "heartbeat" and task["worker"] == worker_id:
+                task["progress"] = data
+            elif event in ("done", "failed") and task["worker"] == worker_id:
+                task.update(state=event, result=data.get("result"), error=data.get("error"))
+
+        # Jobs of workers that stopped reporting go back to the queue
+        self._requeue(lambda task: task["worker"] and now - self.seen.get(task["worker"], (None, 0))[1] > self.lease)
+
+    def _requeue(self, match):
+        for task_id, task in self.state.items():
+            if task["state"] == "claimed" and match(task):
+                logger.warning(f"Task {task_id} lease of {task['worker']} expired, handing it back")
+                task.update(state="queued", worker=None, progress=0)
+                self.tasks.put((task_id, self.payloads[task_id]))
+
+    def _submit(self, task_id, payload):
+        with self.lock:
+            self.state[task_id] = {"state": "queued", "worker": None, "progress": 0, "result": None, "error": None}
+            self.payloads[task_id] = payload
+        self.tasks.put((task_id, payload))
+
+    def _get(self, task_id):
+        with self.lock:
+            self._drain()
+            task = self.state.get(task_id)
+            return dict(task) if task else None
+
+    def _cancel(self, task_id):
+        with self.lock:
+            self._drain()
+            if task_id in self.state:
+                self.state[task_id]["state"] = "cancelled"
+        # The task may still sit in the shared queue, tell every worker
+        for control in self.controls:
+            control.put(task_id)
+
+    def _remove(self, task_id):
+        with self.lock:
+            self.state.pop(task_id, None)
+            self.payloads.pop(task_id, None)
+
+    def _workers(self, max_age):
+        with self.lock:
+            self._drain()
+            now = time.time()
+            return [
+                {"id": worker_id, "info": info, "last_seen": last_seen}
+                for worker_id, (info, last_seen) in self.seen.items()
+                if now - last_seen <= max_age
+            ]
+
+    # ================== WORKER SIDE ==================
+
+    def _read_controls(self):
+        control = self.controls[self.index]
+        now = time.time()
+        while True:
+            try:
+                self.cancelled[control.get_nowait()] = now
+            except queue.Empty:
+                break
+        # Every worker hears of every cancellation, most never see the task
+        for task_id, cancelled_at in list(self.cancelled.items()):
+            if now - cancelled_at > self.lease:
+                del self.cancelled[task_id]
+
+    def _register(self, worker_id, info):
+        self.events.put(("register", None, worker_id, info))
+
+    def _unregister(self, worker_id):
+        self.events.put(("unregister", None, worker_id, None))
+
+    def _claim(self, worker_id):
+        self._read_controls()
+        while True:
+            try:
+                task_id, payload = self.tasks.get_nowait()
+            except queue.Empty:
+                self.events.put(("alive", None, worker_id, None))
+                return None
+            if self.cancelled.pop(task_id, None):
+                continue
+            self.events.put(("claimed", task_id, worker_id, self.index))
+            return task_id, payload
+
+    def _heartbeat(self, worker_id, task_id, progress):
+        self._read_controls()
+        if task_id in self.cancelled:
+            return "cancelled"
+        self.events.put(("heartbeat", task_id, worker_id, progress))
+        return "claimed"
+
+    def _finish(self, worker_id, task_id, state, result, error):
+        self.cancelled.pop(task_id, None)
+        self.events.put((state, task_id, worker_id, {"result": result, "error": error}))
+
+BROKERS = {"sqlite": SQLiteBroker}
+
+def get_broker(backend: str = BROKER_BACKEND) -> Broker:
+    """Broker for the configured backend"""
+    try:
+        return BROKERS[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown broker backend: {backend}")
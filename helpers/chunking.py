@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+import time
+import logging
+from config import (
+    CHUNK_SIZE,
+    CHUNK_SIZE_MIN,
+    CHUNK_SIZE_MAX,
+    CHUNK_TARGET_SECONDS,
+    CHUNK_MEMORY_FRACTION,
+    WORKER_COUNT
+)
+
+logger = logging.getLogger(__name__)
+
+# Chunks held per transfer: the one in hand, one being written and one read ahead
+BUFFERS_PER_TRANSFER = 3
+# How long a /proc/meminfo reading is trusted
+MEMINFO_TTL = 5
+
+def read_available_memory() -> int:
+    """MemAvailable in bytes, 0 when the platform doesn't expose it"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+def _round_down_pow2(value: int) -> int:
+    return 1 << (max(int(value), 1).bit_length() - 1)
+
+class ChunkSizer:
+    """
+    Chunk size shared by URL downloads, disk writes and upload reads.
+    Transfers report how long each chunk took; the size follows the
+    smoothed throughput so one chunk takes about `target_seconds`, and
+    is capped so every worker's buffers fit in a slice of free memory.
+    Sizes are powers of two between `minimum` and `maximum`.
+    """
+
+    def __init__(self, initial: int = CHUNK_SIZE, minimum: int = CHUNK_SIZE_MIN,
+                 maximum: int = CHUNK_SIZE_MAX, target_seconds: float = CHUNK_TARGET_SECONDS,
+                 memory_fraction: float = CHUNK_MEMORY_FRACTION, transfers: int = WORKER_COUNT):
+        self.minimum = _round_down_pow2(minimum)
+        self.maximum = max(_round_down_pow2(maximum), self.minimum)
+        self.target_seconds = target_seconds
+        self.memory_fraction = memory_fraction
+        self.transfers = max(transfers, 1)
+        self.throughput = 0.0
+        self.size = self._clamp(initial)
+        self._available = 0
+        self._available_at = 0.0
+
+    def _clamp(self, size: int) -> int:
+        return min(max(_round_down_pow2(size), self.minimum), self.maximum)
+
+    def memory_cap(self) -> int:
+        """Largest chunk that keeps all transfer buffers inside the memory budget"""
+        now = time.monotonic()
+        if now - self._available_at > MEMINFO_TTL:
+            self._available = read_available_memory()
+            self._available_at = now
+        if not self._available:
+            return self.maximum
+        return int(self._available * self.memory_fraction / (self.transfers * BUFFERS_PER_TRANSFER))
+
+    def record(self, nbytes: int, seconds: float):
+        """Feed one chunk's transfer time into the estimate"""
+        if nbytes <= 0 or seconds <= 0:
+            return
+        rate = nbytes / seconds
+        # Bigger chunks say more about the link, weight them accordingly
+        weight = min(nbytes / max(self.size, 1), 1.0) * 0.2
+        self.throughput = rate if not self.throughput else self.throughput * (1 - weight) + rate * weight
+
+        wanted = min(self.throughput * self.target_seconds, self.memory_cap())
+        size = self._clamp(wanted)
+        if size != self.size:
+            logger.debug(
+                f"Chunk size {self.size // 1024} KB -> {size // 1024} KB "
+                f"at {self.throughput / 1048576:.1f} MB/s"
+            )
+            self.size = size
+
+    def snapshot(self) -> dict:
+        return {
+            "chunk_size": self.size,
+            "throughput": self.throughput,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "memory_cap": self.memory_cap()
+        }
+
+# Global chunk sizer instance
+chunk_sizer = ChunkSizer()
+
+async def rechunk(pieces, on_piece=None):
+    """
+    Gather an async stream of network reads into adaptive-size chunks.
+    `on_piece` is called with the size of every read, so progress is
+    reported even while a large chunk is still filling.
+    """
+    parts, pending = [], 0
+    last = time.perf_counter()
+    async for data in pieces:
+        parts.append(data)
+        pending += len(data)
+        if on_piece:
+            on_piece(len(data))
+
+        if pending >= chunk_sizer.size:
+            now = time.perf_counter()
+            chunk_sizer.record(pending, now - last)
+            last = now
+            chunk = parts[0] if len(parts) == 1 else b"".join(parts)
+            parts, pending = [], 0
+            yield chunk
+
+    if parts:
+        yield b"".join(parts)
@@ -4,6 +4,7 @@ from pyrogram import Client
 from pyrogram.types import Message, CallbackQuery
 from config import ADMIN_IDS, OWNER_ID
 from database import db
+from helpers.rate_limit import flood_shield
 
 def admin_only(func):
     """Decorator to restrict function to admins only"""
@@ -72,4 +73,25 @@ def not_banned(func):
         
         return await func(client, update, *args, **kwargs)
     
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+def rate_limited(func):
+    """Decorator to silently drop updates from flooding users"""
+    @wraps(func)
+    async def wrapper(client: Client, update, *args, **kwargs):
+        user = update.from_user
+
+        # Dropped messages never trigger an API call, dropped callback
+        # queries are answered empty so the button stops spinning
+        if user and user.id not in ADMIN_IDS and user.id != OWNER_ID:
+            if not flood_shield.allow(user.id, getattr(update, "media_group_id", None)):
+                if isinstance(update, CallbackQuery):
+                    try:
+                        await update.answer()
+                    except Exception:
+                        pass
+                return
+
+        return await func(client, update, *args, **kwargs)
+
+    return wrapper
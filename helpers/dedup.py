@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+import json
+import os
+import time
+import asyncio
+import logging
+import aiohttp
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from config import (
+    DEDUP_FILE,
+    DEDUP_TTL,
+    DEDUP_REVALIDATE_AFTER,
+    HEADERS
+)
+from helpers.file_io import run_io, write_file_atomic
+
+logger = logging.getLogger(__name__)
+
+GOFILE_CONTENT_API = "https://api.gofile.io/contents/{code}"
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL so trivial variations share a cache entry"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+def get_tg_key(media) -> str:
+    """Dedup key for a Telegram file, stable across re-sends"""
+    unique_id = getattr(media, "file_unique_id", None)
+    return f"tg:{unique_id}" if unique_id else None
+
+def get_url_key(url: str, etag: str = "", size: int = 0, last_modified: str = "") -> str:
+    """Dedup key for a URL, only when the server gave us a validator"""
+    # The size alone can't tell a changed file from the cached one
+    if not etag and not last_modified:
+        return None
+    return f"url:{normalize_url(url)}|{etag or last_modified}|{size}"
+
+class DedupIndex:
+    """
+    Persistent map of content keys to the GoFile link they produced.
+    Entries expire after `ttl` seconds and links older than
+    `revalidate_after` are checked against the GoFile API before reuse.
+    """
+
+    def __init__(self, path: str = DEDUP_FILE, ttl: int = DEDUP_TTL,
+                 revalidate_after: int = DEDUP_REVALIDATE_AFTER):
+        self.path = path
+        self.ttl = ttl
+        self.revalidate_after = revalidate_after
+        self.lock = asyncio.Lock()
+        self.entries = self._load()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        """Load the index from file, dropping expired entries"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+        except Exception as e:
+            logger.error(f"Could not read dedup index {self.path}: {e}")
+            return {}
+
+        now = time.time()
+        return {k: v for k, v in entries.items() if now - v["created"] < self.ttl}
+
+    async def _save(self):
+        async with self.lock:
+            data = json.dumps(self.entries).encode()
+            await run_io(write_file_atomic, self.path, data)
+
+    async def lookup(self, key: str):
+        """Return a live cached entry for the key, or None"""
+        if not key:
+            return None
+
+        entry = self.entries.get(key)
+        now = time.time()
+
+        if entry and now - entry["created"] >= self.ttl:
+            await self.forget(key)
+            entry = None
+
+        if entry and now - entry["checked"] >= self.revalidate_after:
+            if await is_link_alive(entry["link"]):
+                entry["checked"] = now
+                await self._save()
+            else:
+                logger.info(f"Dedup link is gone, dropping {key}")
+                await self.forget(key)
+                entry = None
+
+        if entry:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    async def record(self, key: str, link: str, file_name: str, file_size: int):
+        """Remember the GoFile link produced for a key"""
+        if not key:
+            return
+        now = time.time()
+        self.entries[key] = {
+            "link": link,
+            "file_name": file_name,
+            "file_size": file_size,
+            "created": now,
+            "checked": now
+        }
+        await self._save()
+
+    async def forget(self, key: str):
+        if self.entries.pop(key, None) is not None:
+            await self._save()
+
+async def is_link_alive(link: str) -> bool:
+    """Ask GoFile whether a download page still exists, True when unsure"""
+    code = link.rstrip("/").split("/")[-1]
+    try:
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with aiohttp.ClientSession(timeout=timeout, headers=HEADERS) as session:
+            async with session.get(GOFILE_CONTENT_API.format(code=code)) as response:
+                if response.status == 404:
+                    return False
+                result = await response.json(content_type=None)
+                return result.get("status") != "error-notFound"
+    except Exception as e:
+        logger.warning(f"Could not revalidate {link}: {e}")
+        return True
+
+# Global dedup index instance
+dedup_index = DedupIndex()
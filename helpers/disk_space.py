@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import os
+import time
+import shutil
+import logging
+from config import DOWNLOAD_DIR, DISK_FREE_MARGIN, DISK_UNKNOWN_SIZE_RESERVE
+
+logger = logging.getLogger(__name__)
+
+# How long a free space reading is trusted
+USAGE_TTL = 1
+
+class DiskSpace:
+    """
+    Admission control for the download directory.
+    Every running job holds a reservation for its expected size; a queued
+    job is only started when free space minus what running jobs still
+    have to write leaves room for it and `margin` to spare.
+    """
+
+    def __init__(self, path: str = DOWNLOAD_DIR, margin: int = DISK_FREE_MARGIN,
+                 unknown_size: int = DISK_UNKNOWN_SIZE_RESERVE):
+        self.path = path
+        self.margin = margin
+        self.unknown_size = unknown_size
+        self.reservations = {}  # job_id -> (job, bytes)
+        self.waiting = set()    # ids of queued jobs held back for space
+        self._usage = None
+        self._usage_at = 0.0
+
+    def _disk_usage(self):
+        now = time.monotonic()
+        if self._usage is None or now - self._usage_at > USAGE_TTL:
+            self._usage = shutil.disk_usage(self.path)
+            self._usage_at = now
+        return self._usage
+
+    def estimate(self, job) -> int:
+        """Bytes to reserve for a job, a fixed guess when the size is unknown"""
+        return job.file_size or self.unknown_size
+
+    def capacity(self) -> int:
+        """Largest file the disk could ever hold"""
+        return self._disk_usage().total - self.margin
+
+    def fits(self, job) -> bool:
+        """False for jobs that won't fit even on an empty disk"""
+        return not job.file_size or job.file_size <= self.capacity()
+
+    def outstanding(self) -> int:
+        """Reserved bytes that running jobs have not written to disk yet"""
+        total = 0
+        for job, size in self.reservations.values():
+            written = 0
+            if job.file_path:
+                try:
+                    written = os.path.getsize(job.file_path)
+                except OSError:
+                    pass
+            total += max(size - written, 0)
+        return total
+
+    def available(self) -> int:
+        return self._disk_usage().free - self.outstanding() - self.margin
+
+    def can_admit(self, job) -> bool:
+        if self.estimate(job) <= self.available():
+            self.waiting.discard(job.id)
+            return True
+        if job.id not in self.waiting:
+            self.waiting.add(job.id)
+            logger.info(f"Job {job.id} waits for {self.estimate(job)} bytes of disk space")
+        return False
+
+    def reserve(self, job):
+        self.reservations[job.id] = (job, self.estimate(job))
+
+    def release(self, job):
+        self.reservations.pop(job.id, None)
+        self.waiting.discard(job.id)
+        self._usage = None
+
+    @property
+    def reserved(self) -> int:
+        return sum(size for _, size in self.reservations.values())
+
+    def sweep(self):
+        """Blocking: delete files left in the download directory, returns (count, bytes)"""
+        count = freed = 0
+        for entry in os.scandir(self.path):
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError as e:
+                logger.error(f"Could not remove orphaned file {entry.path}: {e}")
+                continue
+            count += 1
+            freed += size
+        self._usage = None
+        return count, freed
+
+# Global disk space instance
+disk_space = DiskSpace()
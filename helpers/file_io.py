@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from config import FILE_IO_THREADS
+from helpers.chunking import chunk_sizer
+
+logger = logging.getLogger(__name__)
+
+# Dedicated pool so disk work never waits behind other executor users
+executor = ThreadPoolExecutor(max_workers=FILE_IO_THREADS, thread_name_prefix="file-io")
+
+async def run_io(func, *args):
+    """Run a blocking file call on the file I/O pool"""
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+class AsyncFileWriter:
+    """
+    Double-buffered file writer.
+    Each chunk is written on the I/O pool while the caller goes back to
+    the network for the next one; only one write is in flight at a time
+    so chunks land in order and memory stays at two chunks.
+    """
+
+    def __init__(self, f, preallocated: int = 0):
+        self._file = f
+        self._pending = None
+        self.preallocated = preallocated
+        self.bytes_written = 0
+
+    @classmethod
+    async def open(cls, path: str, size: int = 0):
+        """Open for writing, reserving `size` bytes on disk up front when known"""
+        f = await run_io(open, path, "wb")
+        preallocated = 0
+        if size:
+            try:
+                await run_io(preallocate, f.fileno(), size)
+                preallocated = size
+            except OSError as e:
+                logger.debug(f"Could not preallocate {path}: {e}")
+        return cls(f, preallocated)
+
+    async def write(self, chunk: bytes):
+        if self._pending:
+            await self._pending
+        self._pending = asyncio.get_running_loop().run_in_executor(executor, self._file.write, chunk)
+        self.bytes_written += len(chunk)
+
+    async def close(self):
+        try:
+            if self._pending:
+                await self._pending
+        finally:
+            self._pending = None
+            try:
+                # Drop the unused tail when the file came out smaller than expected
+                if self.preallocated > self.bytes_written:
+                    await run_io(self._file.truncate, self.bytes_written)
+            finally:
+                await run_io(self._file.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type and self._pending:
+            # Let the in-flight write finish before closing the file
+            try:
+                await self._pending
+            except Exception:
+                pass
+            self._pending = None
+        await self.close()
+        return False
+
+def preallocate(fd: int, size: int):
+    """Blocking: allocate disk blocks so the download can't hit ENOSPC halfway"""
+    if not hasattr(os, "posix_fallocate"):
+        raise OSError("posix_fallocate is not available")
+    os.posix_fallocate(fd, 0, size)
+
+async def read_chunks(path: str, chunk_size: int = None, offset: int = 0):
+    """
+    Yield a file's chunks, reading the next one while the current is consumed.
+    Without a fixed `chunk_size` each read uses the current adaptive size.
+    """
+    f = await run_io(open, path, "rb")
+    loop = asyncio.get_running_loop()
+    try:
+        if offset:
+            f.seek(offset)
+        next_read = loop.run_in_executor(executor, f.read, chunk_size or chunk_sizer.size)
+        while True:
+            chunk = await next_read
+            if not chunk:
+                break
+            next_read = loop.run_in_executor(executor, f.read, chunk_size or chunk_sizer.size)
+            yield chunk
+    finally:
+        await run_io(f.close)
+
+async def remove_file(path: str):
+    """Delete a file off the loop, ignoring files that are already gone"""
+    try:
+        await run_io(os.remove, path)
+    except FileNotFoundError:
+        pass
+
+def write_file_atomic(path: str, data: bytes, fsync: bool = False):
+    """Blocking helper: write to a temp file and rename it over the target"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import time
+import hashlib
+import logging
+import functools
+from config import HASH_ALGORITHM
+
+logger = logging.getLogger(__name__)
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+class HashStats:
+    """Process-wide hashing cost, used to check hashing keeps up with the link"""
+
+    def __init__(self):
+        self.bytes = 0
+        self.seconds = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Bytes hashed per second of CPU time spent hashing"""
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+hash_stats = HashStats()
+
+# Algorithms StreamHasher implements, the name ends up in every content key
+ALGORITHMS = ("xxh3", "blake2b")
+
+@functools.lru_cache(maxsize=None)
+def get_algorithm(setting: str = HASH_ALGORITHM) -> str:
+    """Resolve HASH_ALGORITHM, 'auto' prefers xxh3 when xxhash is installed"""
+    if setting == "auto":
+        return "xxh3" if xxhash else "blake2b"
+    if setting not in ALGORITHMS:
+        logger.warning(f"Unknown HASH_ALGORITHM {setting!r}, falling back to blake2b")
+        return "blake2b"
+    if setting == "xxh3" and not xxhash:
+        logger.warning("xxhash is not installed, falling back to blake2b")
+        return "blake2b"
+    return setting
+
+class StreamHasher:
+    """
+    Incremental content hash fed with chunks as they are downloaded,
+    so the file never has to be read a second time.
+    """
+
+    def __init__(self, algorithm: str = None):
+        self.algorithm = get_algorithm(algorithm) if algorithm else get_algorithm()
+        if self.algorithm == "xxh3":
+            self._hash = xxhash.xxh3_128()
+        else:
+            self._hash = hashlib.blake2b(digest_size=20)
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def update(self, chunk: bytes):
+        start = time.perf_counter()
+        self._hash.update(chunk)
+        elapsed = time.perf_counter() - start
+
+        self.bytes += len(chunk)
+        self.seconds += elapsed
+        hash_stats.bytes += len(chunk)
+        hash_stats.seconds += elapsed
+
+    @property
+    def key(self) -> str:
+        """Dedup key for the content hashed so far"""
+        return f"hash:{self.algorithm}:{self._hash.hexdigest()}"
+
+    def log_cost(self, transfer_seconds: float):
+        """Log how much of a transfer was spent hashing"""
+        if not self.bytes:
+            return
+        share = self.seconds / transfer_seconds * 100 if transfer_seconds else 0
+        logger.info(
+            f"Hashed {self.bytes / 1048576:.1f} MB with {self.algorithm} in "
+            f"{self.seconds:.2f}s ({self.bytes / 1048576 / max(self.seconds, 1e-9):.0f} MB/s, "
+            f"{share:.1f}% of transfer time)"
+        )
+
+def new_hasher():
+    """A fresh hasher, or None when content hashing is turned off"""
+    if HASH_ALGORITHM == "off":
+        return None
+    return StreamHasher()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import json
+import os
+import asyncio
+import logging
+from datetime import datetime
+from config import JOBS_FILE
+from helpers.file_io import run_io, write_file_atomic
+
+logger = logging.getLogger(__name__)
+
+class JobStore:
+    """
+    Durable record of queued and running jobs.
+    Only the ids needed to rebuild a job are kept, the Telegram messages
+    themselves are fetched again when the bot restarts.
+    """
+
+    def __init__(self, path: str = JOBS_FILE):
+        self.path = path
+        self.lock = asyncio.Lock()
+        self.jobs = self._load()
+
+    def _load(self):
+        """Load pending jobs from file"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Could not read job store {self.path}: {e}")
+        return {}
+
+    async def _save(self):
+        """Write the store atomically so a crash never leaves half a file"""
+        async with self.lock:
+            data = json.dumps(self.jobs).encode()
+            await run_io(write_file_atomic, self.path, data, True)
+
+    async def add(self, job):
+        """Persist a newly queued job"""
+        self.jobs[job.id] = {
+            "id": job.id,
+            "type": job.type,
+            "source": job.source if job.type == "url" else None,
+            "chat_id": job.message.chat.id,
+            "message_id": job.message.id,
+            "status_msg_id": job.status_msg.id,
+            "user_id": job.user_id,
+            "priority": job.priority,
+            "file_size": job.file_size,
+            "dedup_key": job.dedup_key,
+            "state": "queued",
+            "queued_at": datetime.now().isoformat()
+        }
+        await self._save()
+
+    async def mark_running(self, job):
+        """Remember that a job was picked up by a worker"""
+        if job.id in self.jobs:
+            self.jobs[job.id]["state"] = "running"
+            await self._save()
+
+    async def remove(self, job):
+        """Forget a finished or failed job"""
+        await self.discard(job.id)
+
+    async def discard(self, job_id: str):
+        """Forget a job by id"""
+        if self.jobs.pop(job_id, None) is not None:
+            await self._save()
+
+    def pending(self) -> list:
+        """All stored jobs in the order they were queued"""
+        return list(self.jobs.values())
+
+# Global job store instance
+job_store = JobStore()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from config import LOOP_MONITOR_INTERVAL, SLOW_CALLBACK_THRESHOLD
+from helpers.metrics import Counter, Histogram, LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = Histogram(
+    "gfbot_event_loop_lag_distribution_seconds",
+    "Event loop scheduling delay samples",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+SLOW_CALLBACKS = Counter(
+    "gfbot_slow_callbacks_total",
+    "Times a callback blocked the event loop past the threshold"
+)
+
+class LoopMonitor:
+    """
+    Samples event loop lag and catches callbacks that block the loop.
+    A coroutine on the loop beats a heartbeat every `interval` seconds;
+    a watchdog thread notices when the heartbeat stops for longer than
+    `threshold` and logs the stack the loop thread is stuck in.
+    """
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, threshold: float = SLOW_CALLBACK_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.last_beat = time.monotonic()
+        self.max_lag = 0.0
+        self.samples = deque(maxlen=240)
+        self.stalls = deque(maxlen=50)
+        self.loop_thread_id = None
+        self._stall = None
+
+    async def run(self):
+        """Heartbeat and lag sampler, runs on the monitored loop"""
+        loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        # Constructed at import time, startup must not count as a stall
+        self.last_beat = time.monotonic()
+        threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True).start()
+
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+
+            self.last_beat = time.monotonic()
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG.set(lag)
+            LOOP_LAG_SECONDS.observe(lag)
+
+            stall = self._stall
+            if stall:
+                # Loop is responsive again, close the stall record
+                stall["duration"] = round(lag + self.interval, 3)
+                logger.warning(f"Event loop was blocked for {stall['duration']}s in {stall['where']}")
+                self._stall = None
+
+    def _watchdog(self):
+        while True:
+            time.sleep(self.threshold / 2)
+            blocked = time.monotonic() - self.last_beat - self.interval
+
+            if blocked < self.threshold or self._stall:
+                continue
+
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+
+            stack = traceback.format_stack(frame)
+            self._stall = {
+                "at": time.time(),
+                "duration": None,
+                "where": stack[-1].strip().splitlines()[0] if stack else "unknown",
+                "stack": "".join(stack)
+            }
+            self.stalls.append(self._stall)
+            SLOW_CALLBACKS.inc()
+            logger.warning(
+                f"Event loop blocked for over {self.threshold}s, loop thread stack:\n{self._stall['stack']}"
+            )
+
+    def snapshot(self) -> dict:
+        """Current numbers for the web server"""
+        samples = sorted(self.samples)
+        return {
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "lag_last": self.samples[-1] if self.samples else 0.0,
+            "lag_p50": samples[len(samples) // 2] if samples else 0.0,
+            "lag_p99": samples[int(len(samples) * 0.99)] if samples else 0.0,
+            "lag_max": self.max_lag,
+            "stalls": [
+                {"at": s["at"], "duration": s["duration"], "where": s["where"]}
+                for s in self.stalls
+            ]
+        }
+
+# Global loop monitor instance
+loop_monitor = LoopMonitor()
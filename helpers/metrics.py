@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+# Throughput buckets in bytes per second, 64 KB/s to 1 GB/s
+THROUGHPUT_BUCKETS = tuple(65536 * 4 ** i for i in range(8))
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Base class for a metric family with optional labels"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.children = {}
+        registry.register(self)
+
+    def labels(self, *values, **kwargs):
+        """Child metric for one set of label values"""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.label_names)
+        values = tuple(str(v) for v in values)
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._new_child()
+        return child
+
+    def _default(self):
+        return self.labels() if not self.label_names else None
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self.children.items()):
+            lines.extend(child.render(self.name, self.label_names, values))
+        return lines
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def render(self, name, label_names, values):
+        return [f"{name}{_format_labels(label_names, values)} {_format_value(self.value)}"]
+
+class _CounterChild(_Value):
+    __slots__ = ()
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+class _GaugeChild(_Value):
+    __slots__ = ()
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def time(self):
+        """Context manager observing the duration of its block"""
+        return _Timer(self)
+
+    def render(self, name, label_names, values):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            le = _format_labels(label_names, values, ("le", _format_value(bound)))
+            lines.append(f"{name}_bucket{le} {cumulative}")
+        le = _format_labels(label_names, values, ("le", "+Inf"))
+        lines.append(f"{name}_bucket{le} {self.count}")
+        labels = _format_labels(label_names, values)
+        lines.append(f"{name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), func=None):
+        super().__init__(name, documentation, labels)
+        self.func = func
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def render(self) -> list:
+        # Callback gauges are read at scrape time
+        if self.func:
+            self.set(self.func())
+        return super().render()
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labels)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+class Registry:
+    """All metrics exposed on /metrics"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.error(f"Could not render metric {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# ================== PIPELINE METRICS ==================
+
+STAGE_SECONDS = Histogram(
+    "gfbot_stage_duration_seconds",
+    "Time spent per pipeline stage",
+    labels=("stage",)
+)
+STAGE_BYTES = Counter(
+    "gfbot_stage_bytes_total",
+    "Bytes moved per pipeline stage",
+    labels=("stage",)
+)
+STAGE_THROUGHPUT = Histogram(
+    "gfbot_stage_throughput_bytes_per_second",
+    "Per-transfer throughput per pipeline stage",
+    labels=("stage",),
+    buckets=THROUGHPUT_BUCKETS
+)
+GOFILE_UPLOADS = Counter(
+    "gfbot_gofile_upload_attempts_total",
+    "Upload attempts per GoFile server and result",
+    labels=("server", "result")
+)
+FLOODWAITS = Counter(
+    "gfbot_floodwait_total",
+    "FloodWait errors received from Telegram",
+    labels=("source",)
+)
+FLOODWAIT_SECONDS = Counter(
+    "gfbot_floodwait_seconds_total",
+    "Seconds Telegram asked us to wait"
+)
+DB_SAVE_SECONDS = Histogram(
+    "gfbot_db_save_duration_seconds",
+    "Time spent writing the database file",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+LOOP_LAG = Gauge(
+    "gfbot_event_loop_lag_seconds",
+    "Most recent event loop scheduling delay"
+)
+
+def observe_transfer(stage: str, size: int, seconds: float):
+    """Record one finished transfer stage"""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    STAGE_BYTES.labels(stage).inc(size)
+    if seconds > 0:
+        STAGE_THROUGHPUT.labels(stage).observe(size / seconds)
+
+def count_floodwait(source: str, seconds: float):
+    FLOODWAITS.labels(source).inc()
+    FLOODWAIT_SECONDS.inc(seconds)
+
+class FloodWaitLogHandler(logging.Handler):
+    """Counts the FloodWaits Pyrogram sleeps through on its own"""
+
+    def emit(self, record):
+        msg = record.msg if isinstance(record.msg, str) else ""
+        if msg.startswith("[%s] Waiting for %s seconds") and len(record.args or ()) >= 2:
+            try:
+                count_floodwait("pyrogram", float(record.args[1]))
+            except (TypeError, ValueError):
+                pass
+
+def install_floodwait_hook():
+    logging.getLogger("pyrogram").addHandler(FloodWaitLogHandler(logging.WARNING))
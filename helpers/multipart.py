@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+import os
+import time
+import uuid
+import asyncio
+import logging
+from aiohttp import payload
+from helpers.chunking import chunk_sizer
+from helpers.file_io import run_io, read_chunks
+
+logger = logging.getLogger(__name__)
+
+def _quote(value: str) -> str:
+    """Escape a header parameter the way browsers do for form uploads"""
+    return value.replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+class MultipartFilePayload(payload.Payload):
+    """
+    multipart/form-data body with one file part.
+    The form fields and part headers are written as ordinary bytes, then
+    the file body goes straight from the page cache to the socket with
+    `loop.sendfile` when the connection allows it. TLS, chunked or
+    compressed connections fall back to large read-ahead reads from the
+    file I/O pool.
+    """
+
+    def __init__(self, path: str, fields: dict, file_field: str = "file",
+                 filename: str = None, content_type: str = "application/octet-stream",
+                 progress=None, chunk_size: int = None):
+        self.boundary = uuid.uuid4().hex
+        super().__init__(path, content_type=f"multipart/form-data; boundary={self.boundary}")
+        self._path = path
+        self._progress = progress
+        self._chunk_size = chunk_size
+        self.file_size = os.path.getsize(path)
+        self.sent_with_sendfile = 0
+
+        preamble = []
+        for name, value in fields.items():
+            preamble.append(
+                f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+                f'{value}\r\n'
+            )
+        preamble.append(
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{_quote(file_field)}"; '
+            f'filename="{_quote(filename or os.path.basename(path))}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        )
+        self._preamble = "".join(preamble).encode()
+        self._epilogue = f"\r\n--{self.boundary}--\r\n".encode()
+        self._size = len(self._preamble) + self.file_size + len(self._epilogue)
+
+    def _report(self, size: int):
+        if self._progress:
+            self._progress(size)
+
+    def _can_sendfile(self, writer) -> bool:
+        transport = getattr(writer, "transport", None)
+        if transport is None or transport.get_extra_info("sslcontext") is not None:
+            return False
+        # Bytes must reach the socket exactly as they are on disk
+        if getattr(writer, "chunked", False) or getattr(writer, "_compress", None):
+            return False
+        return hasattr(asyncio.get_running_loop(), "sendfile")
+
+    async def _sendfile(self, writer) -> int:
+        """Send as much of the file as the loop can with sendfile, returns the bytes sent"""
+        loop = asyncio.get_running_loop()
+        f = await run_io(open, self._path, "rb")
+        offset = 0
+        try:
+            # Everything buffered so far has to hit the socket first
+            await writer.drain()
+            while offset < self.file_size:
+                count = min(self._chunk_size or chunk_sizer.size, self.file_size - offset)
+                started = time.perf_counter()
+                sent = await loop.sendfile(writer.transport, f, offset, count, fallback=False)
+                if not sent:
+                    break
+                chunk_sizer.record(sent, time.perf_counter() - started)
+                offset += sent
+                self._report(sent)
+        except (NotImplementedError, RuntimeError) as e:
+            # SendfileNotAvailableError is a RuntimeError
+            logger.debug(f"sendfile unavailable after {offset} bytes, falling back to reads: {e}")
+        finally:
+            await run_io(f.close)
+        self.sent_with_sendfile = offset
+        return offset
+
+    async def write(self, writer):
+        await writer.write(self._preamble)
+
+        offset = 0
+        if self._can_sendfile(writer):
+            offset = await self._sendfile(writer)
+
+        # Each read is a fresh buffer, the transport may hold on to it
+        # Time between chunks, so read-ahead waits and socket backpressure both count
+        last = time.perf_counter()
+        async for chunk in read_chunks(self._path, self._chunk_size, offset):
+            await writer.write(chunk)
+            now = time.perf_counter()
+            chunk_sizer.record(len(chunk), now - last)
+            last = now
+            self._report(len(chunk))
+
+        await writer.write(self._epilogue)
+
+    def decode(self, encoding: str = "utf-8", errors: str = "strict") -> str:
+        raise TypeError("File payloads can't be decoded")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import time
+import logging
+from collections import deque
+from config import (
+    USER_RATE_LIMIT,
+    USER_RATE_BURST,
+    GLOBAL_RATE_LIMIT,
+    GLOBAL_RATE_BURST,
+    FLOOD_STRIKE_LIMIT,
+    FLOOD_STRIKE_WINDOW,
+    FLOOD_BAN_SECONDS,
+    FLOOD_MAX_BAN_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Idle buckets are pruned once the table grows past this size
+PRUNE_THRESHOLD = 10000
+# Telegram delivers the messages of an album within a few seconds
+MEDIA_GROUP_WINDOW = 60
+
+class TokenBucket:
+    """Token bucket refilled lazily whenever tokens are taken"""
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def take(self, cost: float = 1.0, now: float = None) -> bool:
+        """Take tokens if available, returns False when the bucket is empty"""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens < cost:
+            return False
+
+        self.tokens -= cost
+        return True
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+class FloodShield:
+    """
+    Per-user and global token buckets in front of every handler.
+    Users who hit an empty bucket `strike_limit` times within
+    `strike_window` seconds get temporary bans that double in length on
+    every repeat offence; allowed updates in between don't clear strikes,
+    so a steady flood just above the refill rate still adds up.
+    All state is in memory, nothing here talks to Telegram.
+    """
+
+    def __init__(
+        self,
+        user_rate: float = USER_RATE_LIMIT,
+        user_burst: int = USER_RATE_BURST,
+        global_rate: float = GLOBAL_RATE_LIMIT,
+        global_burst: int = GLOBAL_RATE_BURST,
+        strike_limit: int = FLOOD_STRIKE_LIMIT,
+        strike_window: int = FLOOD_STRIKE_WINDOW,
+        ban_seconds: int = FLOOD_BAN_SECONDS,
+        max_ban_seconds: int = FLOOD_MAX_BAN_SECONDS
+    ):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.strike_limit = strike_limit
+        self.strike_window = strike_window
+        self.ban_seconds = ban_seconds
+        self.max_ban_seconds = max_ban_seconds
+
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.buckets = {}   # user_id -> TokenBucket
+        self.strikes = {}   # user_id -> deque of recent strike times
+        self.bans = {}      # user_id -> (banned_until, ban_level)
+        self.groups = {}    # media_group_id -> (first seen, allowed)
+        self.dropped = 0
+
+    def allow(self, user_id: int, media_group_id: str = None) -> bool:
+        """
+        Return True if the update should be handled, False to drop it.
+        An album costs one token: the rest of its messages share the
+        verdict of the first one, so albums bigger than the burst arrive whole
+        """
+        now = time.monotonic()
+
+        if media_group_id:
+            group = self.groups.get(media_group_id)
+            if group and now - group[0] < MEDIA_GROUP_WINDOW:
+                if not group[1]:
+                    self.dropped += 1
+                return group[1]
+            if len(self.groups) >= PRUNE_THRESHOLD:
+                self._prune_groups(now)
+            allowed = self.allow(user_id)
+            self.groups[media_group_id] = (now, allowed)
+            return allowed
+
+        ban = self.bans.get(user_id)
+        if ban:
+            if now < ban[0]:
+                self.dropped += 1
+                return False
+            # Keep the level around so repeat offenders escalate
+            if now - ban[0] > self.max_ban_seconds:
+                del self.bans[user_id]
+
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            if len(self.buckets) >= PRUNE_THRESHOLD:
+                self._prune(now)
+            bucket = self.buckets[user_id] = TokenBucket(self.user_rate, self.user_burst, now)
+
+        if not bucket.take(now=now):
+            self.dropped += 1
+            self._strike(user_id, now)
+            return False
+
+        if not self.global_bucket.take(now=now):
+            self.dropped += 1
+            return False
+
+        return True
+
+    def _strike(self, user_id: int, now: float):
+        strikes = self.strikes.get(user_id)
+        if strikes is None:
+            strikes = self.strikes[user_id] = deque(maxlen=self.strike_limit)
+        strikes.append(now)
+
+        # The oldest of the last `strike_limit` strikes decides
+        if len(strikes) < self.strike_limit or now - strikes[0] > self.strike_window:
+            return
+
+        self.strikes.pop(user_id, None)
+        level = self.bans[user_id][1] + 1 if user_id in self.bans else 0
+        duration = min(self.ban_seconds * (2 ** level), self.max_ban_seconds)
+        self.bans[user_id] = (now + duration, level)
+        logger.warning(f"Flood shield: user {user_id} auto-banned for {duration}s")
+
+    def _prune(self, now: float):
+        """Forget users whose buckets have refilled completely"""
+        idle = [uid for uid, bucket in self.buckets.items() if bucket.is_full(now)]
+        for uid in idle:
+            del self.buckets[uid]
+            self.strikes.pop(uid, None)
+
+    def _prune_groups(self, now: float):
+        expired = [gid for gid, group in self.groups.items() if now - group[0] >= MEDIA_GROUP_WINDOW]
+        for gid in expired:
+            del self.groups[gid]
+
+    def is_temp_banned(self, user_id: int) -> bool:
+        ban = self.bans.get(user_id)
+        return bool(ban) and time.monotonic() < ban[0]
+
+    def unban(self, user_id: int):
+        self.bans.pop(user_id, None)
+        self.strikes.pop(user_id, None)
+        self.buckets.pop(user_id, None)
+
+# Global flood shield instance
+flood_shield = FloodShield()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from config import (
+    PER_USER_MAX_INFLIGHT,
+    SMALL_FILE_LIMIT,
+    LARGE_FILE_LIMIT,
+    LANE_MAX_WAIT
+)
+
+logger = logging.getLogger(__name__)
+
+# Lane indexes, lower lanes are served first
+PRIORITY_LANE = 0
+SMALL_LANE = 1
+MEDIUM_LANE = 2
+LARGE_LANE = 3
+LANE_COUNT = 4
+
+def get_lane(file_size: int, priority: bool = False) -> int:
+    """Pick the lane for a job, unknown sizes go to the medium lane"""
+    if priority:
+        return PRIORITY_LANE
+    if not file_size:
+        return MEDIUM_LANE
+    if file_size < SMALL_FILE_LIMIT:
+        return SMALL_LANE
+    if file_size >= LARGE_FILE_LIMIT:
+        return LARGE_LANE
+    return MEDIUM_LANE
+
+class JobCancelled(Exception):
+    """Raised inside a job's pipeline once the user cancelled it"""
+
+class Job:
+    """A single file or URL transfer waiting in the scheduler"""
+
+    def __init__(self, job_type: str, source, message, status_msg, user_id: int,
+                 priority: bool = False, file_size: int = 0):
+        self.id = uuid.uuid4().hex[:8]
+        self.type = job_type
+        self.source = source
+        self.message = message
+        self.status_msg = status_msg
+        self.user_id = user_id
+        self.priority = priority
+        self.file_size = file_size or 0
+        self.created_at = time.monotonic()
+        self.enqueued_at = None  # Wall clock, for tracing
+        self.started_at = None
+        self.last_position = None
+        self.last_activity = self.created_at
+        self.cancelled = False
+        self.task = None
+        self.file_path = None
+        self.dedup_key = None
+        self.content_key = None
+        self.followers = []  # identical jobs waiting on this one
+        self.result = None   # (file_name, file_size, source, link) once uploaded
+
+    @property
+    def lane(self) -> int:
+        return get_lane(self.file_size, self.priority)
+
+    def touch(self, *_):
+        """Record transfer progress for the idle watchdog"""
+        self.last_activity = time.monotonic()
+
+    def cancel(self):
+        """Flag the job as cancelled and interrupt it if it is running"""
+        self.cancelled = True
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(self.id)
+
+class FairScheduler:
+    """
+    Fair-share, size-aware job scheduler.
+    Jobs are split into small/medium/large lanes by known size so a small
+    document never waits behind a huge video. Inside a lane every user has
+    a sub-queue and users are served round-robin, so one user with 50 URLs
+    can't hold the pipeline. Admin jobs get a priority lane, a user never
+    has more than `max_inflight` jobs running, and a job that waited longer
+    than `max_wait` is served before the smaller lanes; while such a job
+    waits for admission (disk space), no newer job is admitted either.
+    Identical jobs (same dedup key) are coalesced: later ones attach to
+    the job already queued or running instead of transferring again.
+    """
+
+    def __init__(self, max_inflight: int = PER_USER_MAX_INFLIGHT, max_wait: int = LANE_MAX_WAIT):
+        self.max_inflight = max_inflight
+        self.max_wait = max_wait
+        self.lanes = [OrderedDict() for _ in range(LANE_COUNT)]  # user_id -> deque of jobs
+        self.inflight = {}  # user_id -> running job count
+        self.running = {}   # job_id -> job
+        self.flights = {}   # dedup key -> leading job
+        self.admission = None  # Optional can_admit/reserve/release gate, e.g. disk space
+        self.cond = asyncio.Condition()
+
+    # ================== QUEUE OPERATIONS ==================
+
+    async def put(self, job: Job) -> int:
+        """Queue a job and return its 1-based queue position"""
+        async with self.cond:
+            self.lanes[job.lane].setdefault(job.user_id, deque()).append(job)
+            if job.dedup_key and job.dedup_key not in self.flights:
+                self.flights[job.dedup_key] = job
+            self.cond.notify()
+        return self.position(job)
+
+    async def get(self) -> Job:
+        """Wait for the next job that is allowed to run"""
+        async with self.cond:
+            while True:
+                job = self._pick()
+                if job:
+                    self.inflight[job.user_id] = self.inflight.get(job.user_id, 0) + 1
+                    self.running[job.id] = job
+                    if self.admission:
+                        self.admission.reserve(job)
+                    job.started_at = time.monotonic()
+                    return job
+                await self.cond.wait()
+
+    async def done(self, job: Job):
+        """Mark a job as finished so the user's next job can run"""
+        async with self.cond:
+            self.running.pop(job.id, None)
+            if self.admission:
+                self.admission.release(job)
+            count = self.inflight.get(job.user_id, 0) - 1
+            if count > 0:
+                self.inflight[job.user_id] = count
+            else:
+                self.inflight.pop(job.user_id, None)
+            self.cond.notify_all()
+
+    async def wake(self):
+        """Re-check held back jobs, e.g. after disk space was freed elsewhere"""
+        async with self.cond:
+            self.cond.notify_all()
+
+    # ================== COALESCING ==================
+
+    def get_flight(self, key: str):
+        """The queued or running job for a dedup key, if any"""
+        leader = self.flights.get(key) if key else None
+        if leader and not leader.cancelled:
+            return leader
+        return None
+
+    def attach(self, job: Job) -> bool:
+        """Attach a job to an identical one in flight, False if none is left"""
+        leader = self.get_flight(job.dedup_key)
+        if not leader:
+            return False
+        leader.followers.append(job)
+        return True
+
+    def end_flight(self, job: Job):
+        """Stop accepting followers for a job that is finishing"""
+        if job.dedup_key and self.flights.get(job.dedup_key) is job:
+            del self.flights[job.dedup_key]
+
+    def _pick(self):
+        # Bounded starvation: the longest waiting overdue job goes first
+        deadline = time.monotonic() - self.max_wait
+        overdue = None
+        for lane_index in range(SMALL_LANE, LANE_COUNT):
+            for user_id, jobs in self.lanes[lane_index].items():
+                if jobs[0].created_at > deadline or not self._can_run(user_id):
+                    continue
+                if overdue is None or jobs[0].created_at < overdue[2]:
+                    overdue = (lane_index, user_id, jobs[0].created_at)
+
+        if overdue:
+            job = self.lanes[overdue[0]][overdue[1]][0]
+            # Newer jobs would keep taking the space it waits for
+            if not self._admitted(job):
+                return None
+            return self._take(overdue[0], overdue[1])
+
+        for lane_index, lane in enumerate(self.lanes):
+            for user_id, jobs in lane.items():
+                if self._can_run(user_id) and self._admitted(jobs[0]):
+                    return self._take(lane_index, user_id)
+        return None
+
+    async def cancel(self, job_id: str):
+        """Cancel a queued or running job, returns the job or None"""
+        async with self.cond:
+            job = self.running.get(job_id)
+            if job:
+                job.cancel()
+                return job
+
+            for lane in self.lanes:
+                for user_id, jobs in lane.items():
+                    for job in jobs:
+                        if job.id == job_id:
+                            jobs.remove(job)
+                            if not jobs:
+                                del lane[user_id]
+                            job.cancel()
+                            self.end_flight(job)
+                            return job
+
+            for leader in self._all_jobs():
+                for job in leader.followers:
+                    if job.id == job_id:
+                        leader.followers.remove(job)
+                        job.cancel()
+                        return job
+        return None
+
+    def get_job(self, job_id: str):
+        """Find a queued, running or attached job by id"""
+        for job in self._all_jobs():
+            if job.id == job_id:
+                return job
+            for follower in job.followers:
+                if follower.id == job_id:
+                    return follower
+        return None
+
+    def _all_jobs(self) -> list:
+        return list(self.running.values()) + self.queued_jobs()
+
+    def _can_run(self, user_id: int) -> bool:
+        return self.inflight.get(user_id, 0) < self.max_inflight
+
+    def _admitted(self, job: Job) -> bool:
+        return self.admission is None or self.admission.can_admit(job)
+
+    def _take(self, lane_index: int, user_id: int) -> Job:
+        lane = self.lanes[lane_index]
+        jobs = lane[user_id]
+        job = jobs.popleft()
+        if jobs:
+            # Served users go to the back of the round
+            lane.move_to_end(user_id)
+        else:
+            del lane[user_id]
+        return job
+
+    # ================== POSITIONS ==================
+
+    def position(self, job: Job) -> int:
+        """Estimate the 1-based dispatch position of a queued job"""
+        lane = self.lanes[job.lane]
+        jobs = lane.get(job.user_id)
+        if not jobs or job not in jobs:
+            return 0
+
+        index = jobs.index(job)
+        ahead = sum(self.lane_size(i) for i in range(job.lane))
+
+        # Users earlier in the rotation get one extra turn before ours
+        before = True
+        for user_id, other in lane.items():
+            if user_id == job.user_id:
+                before = False
+                continue
+            ahead += min(len(other), index + 1 if before else index)
+
+        return ahead + index + 1
+
+    def estimate_position(self, user_id: int, priority: bool = False, file_size: int = 0) -> int:
+        """Position a new job from this user would get if queued now"""
+        lane_index = get_lane(file_size, priority)
+        lane = self.lanes[lane_index]
+        own = len(lane.get(user_id, ()))
+        ahead = sum(self.lane_size(i) for i in range(lane_index))
+
+        before = True
+        for other_id, other in lane.items():
+            if other_id == user_id:
+                before = False
+                continue
+            ahead += min(len(other), own + 1 if before else own)
+
+        return ahead + own + 1
+
+    # ================== INTROSPECTION ==================
+
+    def lane_size(self, lane_index: int) -> int:
+        return sum(len(jobs) for jobs in self.lanes[lane_index].values())
+
+    def qsize(self) -> int:
+        return sum(self.lane_size(i) for i in range(len(self.lanes)))
+
+    def queued_jobs(self) -> list:
+        return [job for lane in self.lanes for jobs in lane.values() for job in jobs]
+
+    def user_jobs(self, user_id: int) -> list:
+        return [job for job in self.queued_jobs() if job.user_id == user_id]
+
+# Global scheduler instance
+scheduler = FairScheduler()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How often a running stage is checked for stalls
+WATCHDOG_INTERVAL = 5
+
+class StageTimeout(Exception):
+    """A pipeline stage went idle or ran past its total time limit"""
+
+async def run_stage(coro, job, stage: str, total_timeout: float, idle_timeout: float):
+    """
+    Run one pipeline stage under an idle and a total timeout.
+    The stage reports progress through `job.touch()`; if nothing happens
+    for `idle_timeout` seconds the stage is cancelled and StageTimeout
+    is raised, freeing the worker.
+    """
+    task = asyncio.ensure_future(coro)
+    job.touch()
+    deadline = time.monotonic() + total_timeout
+
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=min(idle_timeout, WATCHDOG_INTERVAL))
+            if done:
+                return task.result()
+
+            now = time.monotonic()
+            if now - job.last_activity > idle_timeout:
+                raise StageTimeout(f"{stage} stalled for {idle_timeout}s")
+            if now > deadline:
+                raise StageTimeout(f"{stage} took longer than {total_timeout}s")
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
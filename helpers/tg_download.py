@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+import os
+import math
+import asyncio
+import logging
+from pyrogram.errors import FloodWait
+from config import TG_DOWNLOAD_STREAMS, TG_SEGMENT_CHUNKS
+from helpers.file_io import AsyncFileWriter, preallocate, run_io
+from helpers.metrics import count_floodwait
+
+logger = logging.getLogger(__name__)
+
+# Pyrogram streams files in 1 MiB chunks, offsets and limits count these
+TG_CHUNK_SIZE = 1024 * 1024
+# Attempts per range without progress before the whole download fails
+RANGE_ATTEMPTS = 3
+# Largest read-back handed to the hasher at once
+HASH_READ_SIZE = 4 * TG_CHUNK_SIZE
+
+class IncompleteDownload(Exception):
+    """Telegram ended a stream before all of its bytes arrived"""
+
+def plan_ranges(file_size: int, streams: int, min_chunks: int) -> list:
+    """
+    Split a file into at most `streams` contiguous (first chunk, chunks)
+    ranges of at least `min_chunks` chunks each
+    """
+    total = math.ceil(file_size / TG_CHUNK_SIZE)
+    count = max(1, min(streams, total // max(min_chunks, 1)))
+    per_range = math.ceil(total / count)
+    return [(first, min(per_range, total - first)) for first in range(0, total, per_range)]
+
+class RangeDownload:
+    """
+    Downloads a Telegram file over several streams, each fetching one
+    contiguous range with a single stream_media call, so every stream
+    sets up Pyrogram's media session once. Chunks are written in place
+    at their offset; the hasher follows the written prefix of the file
+    in order, reading it back from the page cache.
+    """
+
+    def __init__(self, client, message, file_size: int, fd: int, ranges: list, on_chunk=None):
+        self.client = client
+        self.message = message
+        self.file_size = file_size
+        self.fd = fd
+        self.ranges = ranges
+        self.on_chunk = on_chunk
+        self.written = [0] * len(ranges)  # bytes written from the start of each range
+        self.progress = asyncio.Event()
+
+    def _range_bytes(self, index: int) -> tuple:
+        """(offset, length) of a range in bytes"""
+        first, chunks = self.ranges[index]
+        offset = first * TG_CHUNK_SIZE
+        return offset, min(chunks * TG_CHUNK_SIZE, self.file_size - offset)
+
+    async def _stream(self, index: int):
+        first, chunks = self.ranges[index]
+        offset, length = self._range_bytes(index)
+        # Resume from the last whole chunk, only the file's final chunk is short
+        self.written[index] -= self.written[index] % TG_CHUNK_SIZE
+        done = self.written[index] // TG_CHUNK_SIZE
+
+        async for chunk in self.client.stream_media(self.message, offset=first + done, limit=chunks - done):
+            await run_io(os.pwrite, self.fd, chunk, offset + self.written[index])
+            self.written[index] += len(chunk)
+            self.progress.set()
+            if self.on_chunk:
+                self.on_chunk(len(chunk))
+
+        # Pyrogram logs most errors and just ends the stream, so count
+        if self.written[index] != length:
+            raise IncompleteDownload(f"Range {index} ended after {self.written[index]} of {length} bytes")
+
+    async def fetch(self, index: int):
+        """Download one range, resuming where a failed stream stopped"""
+        attempt = 0
+        while True:
+            before = self.written[index]
+            try:
+                return await self._stream(index)
+            except FloodWait as e:
+                count_floodwait("download", e.value)
+                await asyncio.sleep(e.value)
+            except (OSError, asyncio.TimeoutError, IncompleteDownload) as e:
+                # Only attempts that made no progress count towards giving up
+                attempt = 1 if self.written[index] > before else attempt + 1
+                if attempt >= RANGE_ATTEMPTS:
+                    raise
+                logger.warning(f"Range {index} failed ({e}), resuming")
+                await asyncio.sleep(attempt)
+
+    async def hash_written(self, hasher):
+        """Feed the file to `hasher` in order, as far as the ranges have written it"""
+        for index in range(len(self.ranges)):
+            offset, length = self._range_bytes(index)
+            position = offset
+            while position < offset + length:
+                available = offset + self.written[index]
+                if available <= position:
+                    self.progress.clear()
+                    await self.progress.wait()
+                    continue
+                data = await run_io(os.pread, self.fd, min(available - position, HASH_READ_SIZE), position)
+                hasher.update(data)
+                position += len(data)
+
+async def parallel_download(client, message, file_path: str, file_size: int, hasher=None,
+                            streams: int = TG_DOWNLOAD_STREAMS, min_chunks: int = TG_SEGMENT_CHUNKS,
+                            on_chunk=None) -> int:
+    """
+    Download a Telegram file to `file_path` over up to `streams` streams,
+    feeding `hasher` in order on the way. Returns the bytes written.
+    Raises IncompleteDownload when Telegram keeps ending a stream early.
+    """
+    if not file_size:
+        # Unknown size, nothing to split: one sequential stream
+        async with await AsyncFileWriter.open(file_path) as f:
+            async for chunk in client.stream_media(message):
+                await f.write(chunk)
+                if hasher:
+                    hasher.update(chunk)
+                if on_chunk:
+                    on_chunk(len(chunk))
+            return f.bytes_written
+
+    # Read back by the hasher, so not write-only
+    f = await run_io(open, file_path, "w+b")
+    try:
+        try:
+            await run_io(preallocate, f.fileno(), file_size)
+        except OSError as e:
+            logger.debug(f"Could not preallocate {file_path}: {e}")
+
+        download = RangeDownload(
+            client, message, file_size, f.fileno(),
+            plan_ranges(file_size, streams, min_chunks), on_chunk
+        )
+        tasks = [asyncio.create_task(download.fetch(i)) for i in range(len(download.ranges))]
+        if hasher:
+            tasks.append(asyncio.create_task(download.hash_written(hasher)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return sum(download.written)
+    finally:
+        await run_io(f.close)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+import json
+import time
+import logging
+import contextvars
+from collections import deque
+from config import TRACE_BUFFER_SIZE
+
+logger = logging.getLogger(__name__)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """One timed stage of a job"""
+    __slots__ = ("name", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, start: float = None, **attributes):
+        self.name = name
+        self.start = time.time() if start is None else start
+        self.end = None
+        self.attributes = attributes
+        self.error = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.time()) - self.start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration": round(self.duration, 6),
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+class _SpanContext:
+    __slots__ = ("trace", "span", "token")
+
+    def __init__(self, trace, span):
+        self.trace = trace
+        self.span = span
+
+    def __enter__(self):
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self.token)
+        self.span.end = time.time()
+        if exc_type:
+            self.span.error = exc_type.__name__ if not str(exc) else f"{exc_type.__name__}: {exc}"
+        if self.trace:
+            self.trace.spans.append(self.span)
+        return False
+
+class Trace:
+    """All spans recorded for one job"""
+
+    def __init__(self, trace_id: str, **attributes):
+        self.id = trace_id
+        self.start = time.time()
+        self.end = None
+        self.status = "running"
+        self.attributes = attributes
+        self.spans = []
+
+    def add_span(self, name: str, start: float, end: float = None, **attributes):
+        """Record a span whose timing was measured elsewhere"""
+        span = Span(name, start, **attributes)
+        span.end = time.time() if end is None else end
+        self.spans.append(span)
+        return span
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "start": self.start,
+            "end": self.end,
+            "duration": round((self.end or time.time()) - self.start, 6),
+            "status": self.status,
+            "attributes": self.attributes,
+            "spans": [span.to_dict() for span in self.spans]
+        }
+
+class Tracer:
+    """
+    Lightweight per-job tracer.
+    Finished traces are kept in a ring buffer of `buffer_size` entries,
+    the current trace and span travel with the task through contextvars.
+    """
+
+    def __init__(self, buffer_size: int = TRACE_BUFFER_SIZE):
+        self.active = {}
+        self.finished = deque(maxlen=buffer_size)
+
+    def start(self, trace_id: str, **attributes) -> Trace:
+        """Begin a trace, `activate` makes it current where the job runs"""
+        return self.ensure(trace_id, **attributes)
+
+    def ensure(self, trace_id: str, **attributes) -> Trace:
+        """The active trace for an id, created if missing"""
+        trace = self.active.get(trace_id)
+        if trace is None:
+            trace = self.active[trace_id] = Trace(trace_id, **attributes)
+        return trace
+
+    def activate(self, trace_id: str):
+        """Make an existing trace current, returns a token for `deactivate`"""
+        return _current_trace.set(self.active.get(trace_id))
+
+    def deactivate(self, token):
+        _current_trace.reset(token)
+
+    def span(self, name: str, **attributes) -> _SpanContext:
+        """Context manager timing a span on the current trace"""
+        return _SpanContext(_current_trace.get(), Span(name, **attributes))
+
+    def annotate(self, **attributes):
+        """Add attributes to the innermost open span"""
+        span = _current_span.get()
+        if span:
+            span.set(**attributes)
+
+    def annotate_trace(self, trace_id: str, **attributes):
+        """Add attributes to a whole trace"""
+        trace = self.active.get(trace_id)
+        if trace:
+            trace.attributes.update(attributes)
+
+    def finish(self, trace_id: str, status: str = "ok"):
+        trace = self.active.pop(trace_id, None)
+        if trace:
+            trace.end = time.time()
+            trace.status = status
+            self.finished.append(trace)
+
+    def get(self, trace_id: str):
+        if trace_id in self.active:
+            return self.active[trace_id]
+        for trace in reversed(self.finished):
+            if trace.id == trace_id:
+                return trace
+        return None
+
+    def export_jsonl(self) -> str:
+        """All buffered traces, oldest first, one JSON object per line"""
+        traces = list(self.finished) + list(self.active.values())
+        return "".join(json.dumps(trace.to_dict(), default=str) + "\n" for trace in traces)
+
+# Global tracer instance
+tracer = Tracer()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+import os
+import time
+import aiohttp
+import logging
+import mimetypes
+from config import (
+    GOFILE_API_TOKEN,
+    GOFILE_FOLDER_ID,
+    PRIORITIZED_SERVERS,
+    GOFILE_UPLOAD_URL,
+    DOWNLOAD_DIR,
+    URL_PROBE_TIMEOUT,
+    DOWNLOAD_TIMEOUT,
+    DOWNLOAD_IDLE_TIMEOUT
+)
+from helpers.chunking import rechunk
+from helpers.file_io import AsyncFileWriter
+from helpers.tg_download import IncompleteDownload, parallel_download
+from helpers.multipart import MultipartFilePayload
+from helpers.hashing import new_hasher
+from helpers.tracing import tracer
+from helpers.metrics import GOFILE_UPLOADS
+
+logger = logging.getLogger(__name__)
+
+# ================== TRANSFER PIPELINE ==================
+# Shared by the bot and by stand-alone transfer workers, so nothing in
+# here may touch the bot's client, database or handlers.
+
+def get_url_file_name(url):
+    """File name for a URL download, made up when the URL has no usable one"""
+    try:
+        file_name = url.split("/")[-1].split("?")[0]
+    except:
+        file_name = "download.bin"
+
+    if not file_name or len(file_name) > 100:
+        file_name = f"url_file_{int(time.time())}.bin"
+    return file_name
+
+def get_download_path(job, file_name):
+    """Where a job downloads to, unique per job so equal file names can't collide"""
+    return os.path.join(DOWNLOAD_DIR, f"{job.id}_{file_name}")
+
+# ================== DOWNLOADS ==================
+
+async def download_tg_file(client, message, file_path, job):
+    """Download a Telegram file to disk, hashing it on the way"""
+    hasher = new_hasher()
+    started = time.monotonic()
+
+    def on_chunk(size):
+        job.touch(size)
+        job.raise_if_cancelled()
+
+    written = await parallel_download(client, message, file_path, job.file_size, hasher, on_chunk=on_chunk)
+
+    # The file is preallocated, its size can't tell a short download apart
+    if job.file_size and written != job.file_size:
+        raise IncompleteDownload(f"Got {written} of {job.file_size} bytes from Telegram")
+
+    if hasher:
+        hasher.log_cost(time.monotonic() - started)
+        tracer.annotate(hash=hasher.algorithm, hash_seconds=round(hasher.seconds, 4), size=hasher.bytes)
+        job.content_key = hasher.key
+
+async def download_url(url, file_path, job):
+    """Stream a URL to disk, hashing chunks on the way, returns the HTTP status"""
+    timeout = aiohttp.ClientTimeout(
+        total=DOWNLOAD_TIMEOUT,
+        sock_connect=URL_PROBE_TIMEOUT * 6,
+        sock_read=DOWNLOAD_IDLE_TIMEOUT
+    )
+    connector = aiohttp.TCPConnector(limit=None, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async with session.get(url) as response:
+            if response.status != 200:
+                return response.status
+
+            hasher = new_hasher()
+            started = time.monotonic()
+
+            async with await AsyncFileWriter.open(file_path, response.content_length or job.file_size) as f:
+                async for chunk in rechunk(response.content.iter_any(), job.touch):
+                    job.raise_if_cancelled()
+                    await f.write(chunk)
+                    if hasher:
+                        hasher.update(chunk)
+
+    if hasher:
+        hasher.log_cost(time.monotonic() - started)
+        tracer.annotate(hash=hasher.algorithm, hash_seconds=round(hasher.seconds, 4), size=hasher.bytes)
+        job.content_key = hasher.key
+
+    return 200
+
+# ================== GOFILE UPLOADER ==================
+
+async def upload_to_gofile(path, progress=None, file_name=None):
+    """Upload a file, `file_name` is the name GoFile shows instead of the one on disk"""
+    mime_type, _ = mimetypes.guess_type(file_name or path)
+    if mime_type is None:
+        mime_type = "application/octet-stream"
+
+    connector = aiohttp.TCPConnector(limit=None, ttl_dns_cache=300)
+
+    # One session for every server, closing it also closes the connector
+    async with aiohttp.ClientSession(connector=connector) as session:
+        for attempt, server in enumerate(PRIORITIZED_SERVERS):
+            tracer.annotate(server=server, retries=attempt)
+            try:
+                url = GOFILE_UPLOAD_URL.format(server=server)
+
+                fields = {'token': GOFILE_API_TOKEN}
+                if GOFILE_FOLDER_ID:
+                    fields['folderId'] = GOFILE_FOLDER_ID
+
+                # A fresh body per attempt, the file is sent zero-copy when possible
+                data = MultipartFilePayload(path, fields, filename=file_name, content_type=mime_type, progress=progress)
+
+                async with session.post(url, data=data) as response:
+                    if response.status == 200:
+                        result = await response.json()
+                        if result.get("status") == "ok":
+                            GOFILE_UPLOADS.labels(server, "ok").inc()
+                            tracer.annotate(sendfile_bytes=data.sent_with_sendfile)
+                            return result["data"]["downloadPage"]
+                    GOFILE_UPLOADS.labels(server, f"http_{response.status}").inc()
+            except Exception as e:
+                GOFILE_UPLOADS.labels(server, "error").inc()
+                logger.error(f"Server {server} failed: {e}")
+                continue
+            
+    return None
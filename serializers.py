@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+import json
+import logging
+import functools
+import importlib
+from config import DB_FORMAT, DB_COMPRESSION
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+@functools.lru_cache(maxsize=None)
+def _optional(name: str):
+    """Import an optional library on first use, None when it is missing"""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+# Every zstd frame starts with these bytes
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+ZSTD_LEVEL = 3
+
+# ================== DATA FILE SERIALIZERS ==================
+# Kept out of helpers/ so database.py can use it without importing the
+# helpers package, which imports the database itself. msgpack and
+# zstandard are only imported once a file or setting needs them.
+
+def _json_dumps(obj) -> bytes:
+    if orjson:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":"), default=str).encode()
+
+def _json_loads(data: bytes):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def _msgpack_dumps(obj) -> bytes:
+    return _optional("msgpack").packb(obj, default=str)
+
+def _msgpack_loads(data: bytes):
+    return _optional("msgpack").unpackb(data, strict_map_key=False)
+
+SERIALIZERS = {
+    "json": (_json_dumps, _json_loads),
+    "msgpack": (_msgpack_dumps, _msgpack_loads)
+}
+
+def _unpack(data: bytes) -> tuple:
+    compression = "none"
+    if data.startswith(ZSTD_MAGIC):
+        if not _optional("zstandard"):
+            raise RuntimeError("The file is zstd compressed but zstandard is not installed")
+        compression = "zstd"
+        data = _optional("zstandard").ZstdDecompressor().decompress(data)
+
+    # JSON documents start with an object or array, maybe after whitespace
+    if data.lstrip()[:1] in (b"{", b"["):
+        return "json", compression, data
+    if not _optional("msgpack"):
+        raise RuntimeError("The file is not JSON and msgpack is not installed")
+    return "msgpack", compression, data
+
+def detect_format(data: bytes) -> tuple:
+    """(format, compression) of a data file, judged by its first bytes"""
+    return _unpack(data)[:2]
+
+class Codec:
+    """
+    Serializer plus optional compression for a data file.
+    Writes the configured format; reads whatever format the file is in,
+    so switching DB_FORMAT or DB_COMPRESSION needs no migration step.
+    Formats whose library is missing fall back to compact JSON.
+    """
+
+    def __init__(self, fmt: str = DB_FORMAT, compression: str = DB_COMPRESSION):
+        if fmt not in SERIALIZERS:
+            raise ValueError(f"Unknown data file format: {fmt}")
+        if fmt == "msgpack" and not _optional("msgpack"):
+            logger.warning("msgpack is not installed, falling back to json")
+            fmt = "json"
+        if compression == "zstd" and not _optional("zstandard"):
+            logger.warning("zstandard is not installed, writing uncompressed")
+            compression = "none"
+
+        self.format = fmt
+        self.compression = compression
+
+    @property
+    def name(self) -> str:
+        return self.format if self.compression == "none" else f"{self.format}+{self.compression}"
+
+    def dumps(self, obj) -> bytes:
+        data = SERIALIZERS[self.format][0](obj)
+        if self.compression == "zstd":
+            data = _optional("zstandard").ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        return data
+
+    def loads(self, data: bytes):
+        return self.read(data)[0]
+
+    def read(self, data: bytes) -> tuple:
+        """Decode a file in any format, returns (object, name of the format it was in)"""
+        fmt, compression, data = _unpack(data)
+        name = fmt if compression == "none" else f"{fmt}+{compression}"
+        return SERIALIZERS[fmt][1](data), name
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+import os
+import time
+import socket
+import asyncio
+import logging
+import uvloop
+from pyrogram import Client, idle
+
+# ================== SPEED OPTIMIZATION ==================
+uvloop.install()
+
+# ================== IMPORTS ==================
+from config import *
+from helpers.scheduler import Job
+from helpers.stages import run_stage
+from helpers.file_io import remove_file
+from helpers.broker import get_broker
+from helpers.metrics import observe_transfer
+from pipeline import get_url_file_name, get_download_path, download_tg_file, download_url, upload_to_gofile
+
+os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# ================== WORKER INSTANCE ==================
+# A stateless transfer worker: claims jobs from the broker, downloads and
+# uploads them with its own Telegram session and reports the GoFile link
+# back. The dispatcher (bot.py with TRANSFER_MODE=broker) talks to users.
+# Start or stop as many as needed, claimed jobs of a worker that goes away
+# return to the queue. With TRANSFER_MODE=processes the bot forks these
+# itself and hands them an IPC broker, see run_process.
+
+worker_id = None
+broker = None
+
+def make_client(name: str) -> Client:
+    return Client(
+        f"gofile_worker_{name}",
+        api_id=API_ID,
+        api_hash=API_HASH,
+        bot_token=BOT_TOKEN,
+        no_updates=True,
+        max_concurrent_transmissions=WORKER_CONCURRENCY * TG_DOWNLOAD_STREAMS
+    )
+
+# ================== TRANSFER ==================
+
+async def transfer(client, job, payload):
+    """Download and upload one job, returns the result for the dispatcher"""
+    started = time.monotonic()
+
+    if job.type == "url":
+        file_name = get_url_file_name(job.source)
+        job.file_path = get_download_path(job, file_name)
+        status = await run_stage(
+            download_url(job.source, job.file_path, job),
+            job, "URL download", DOWNLOAD_TIMEOUT, DOWNLOAD_IDLE_TIMEOUT
+        )
+        if status != 200:
+            raise RuntimeError(f"URL Error: {status}")
+    else:
+        message = await client.get_messages(payload["chat_id"], payload["message_id"])
+        media = None
+        if message and not message.empty:
+            media = message.document or message.video or message.audio or message.photo
+        if not media:
+            raise RuntimeError("The file message is gone")
+        file_name = getattr(media, "file_name", None) or f"file_{message.id}_{int(time.time())}"
+        job.file_path = get_download_path(job, file_name)
+        await run_stage(
+            download_tg_file(client, message, job.file_path, job),
+            job, "Telegram download", DOWNLOAD_TIMEOUT, DOWNLOAD_IDLE_TIMEOUT
+        )
+
+    file_size = os.path.getsize(job.file_path)
+    observe_transfer("download", file_size, time.monotonic() - started)
+
+    started = time.monotonic()
+    link = await run_stage(
+        upload_to_gofile(job.file_path, progress=job.touch, file_name=file_name),
+        job, "GoFile upload", UPLOAD_TIMEOUT, UPLOAD_IDLE_TIMEOUT
+    )
+    if not link:
+        raise RuntimeError("Upload Failed. GoFile servers might be busy.")
+    observe_transfer("upload", file_size, time.monotonic() - started)
+
+    return {
+        "link": link,
+        "file_name": file_name,
+        "file_size": file_size,
+        "content_key": job.content_key,
+        "worker": worker_id
+    }
+
+async def keep_lease(job):
+    """Heartbeat a claimed job, cancels it when the dispatcher did"""
+    while True:
+        await asyncio.sleep(broker.lease / 3)
+        written = 0
+        if job.file_path:
+            try:
+                written = os.path.getsize(job.file_path)
+            except OSError:
+                pass
+        try:
+            state = await broker.heartbeat(worker_id, job.id, written)
+        except Exception as e:
+            logger.error(f"Heartbeat for {job.id} failed: {e}")
+            continue
+        if state != "claimed":
+            logger.info(f"Job {job.id} was cancelled")
+            job.cancel()
+            return
+
+async def run_task(client, task_id, payload):
+    job = Job(
+        payload["type"], payload.get("source"), None, None, payload["user_id"],
+        file_size=payload.get("file_size", 0)
+    )
+    job.id = task_id
+    logger.info(f"Claimed job {job.id} ({job.type})")
+
+    job.task = asyncio.create_task(transfer(client, job, payload))
+    lease = asyncio.create_task(keep_lease(job))
+    try:
+        result = await job.task
+        await broker.complete(worker_id, job.id, result)
+        logger.info(f"Finished job {job.id}: {result['link']}")
+    except asyncio.CancelledError:
+        if not job.cancelled:
+            # Worker is shutting down, unregistering hands the job back
+            job.cancel()
+            raise
+        await broker.fail(worker_id, job.id, "cancelled")
+    except Exception as e:
+        logger.error(f"Job {job.id} failed: {e}")
+        await broker.fail(worker_id, job.id, str(e))
+    finally:
+        lease.cancel()
+        if job.file_path:
+            await remove_file(job.file_path)
+
+async def worker_loop(client):
+    """Claim and run jobs one at a time until the worker stops"""
+    while True:
+        try:
+            claimed = await broker.claim(worker_id)
+        except Exception as e:
+            logger.error(f"Broker claim failed: {e}")
+            claimed = None
+
+        if not claimed:
+            await asyncio.sleep(BROKER_POLL_INTERVAL)
+            continue
+        await run_task(client, *claimed)
+
+# ================== MAIN EXECUTION ==================
+
+async def main(worker_broker=None, name: str = None):
+    global worker_id, broker
+    worker_id = name or WORKER_ID or f"{socket.gethostname()}-{os.getpid()}"
+    broker = worker_broker or get_broker()
+    app = make_client(worker_id)
+
+    await app.start()
+    await broker.register(worker_id, {"host": socket.gethostname(), "pid": os.getpid(), "slots": WORKER_CONCURRENCY})
+    loops = [asyncio.create_task(worker_loop(app)) for _ in range(WORKER_CONCURRENCY)]
+    print(f"🚚 Transfer worker {worker_id} ready with {WORKER_CONCURRENCY} slots.")
+
+    await idle()
+
+    for task in loops:
+        task.cancel()
+    await asyncio.gather(*loops, return_exceptions=True)
+    await broker.unregister(worker_id)
+    await app.stop()
+
+def run_process(worker_broker, name: str):
+    """Entry point of a transfer process forked by the bot"""
+    asyncio.run(main(worker_broker, name))
+
+if __name__ == "__main__":
+    loop = asyncio.get_event_loop()
+
+    loop.run_until_complete(main())